@@ -0,0 +1,88 @@
+"""
+xccdf_content write throughput at 10k and 100k rows (user-004)
+
+Compares the per-row INSERT loop stig.update_content used
+to run over a list of every row against the batched writer,
+which takes a generator and commits in chunks on a WAL
+connection. Rows carry 200 bytes of unique content, the
+batched writer is timed with and without the blob store
+which hashes and compresses content since it was added.
+
+    python bench/content_writes.py
+"""
+
+import os
+import sqlite3
+import time
+import tracemalloc
+from fixtures import workspace
+from modules import db_management
+
+def rows(count, content = True):
+    for n in range(count):
+        yield {
+            'stigId': 'Bench_' + str(n) + '_STIG',
+            'fileName': 'U_Bench_' + str(n) + '_STIG_Manual-xccdf.xml',
+            'zipFolder': 'U_Bench_' + str(n) + '_STIG.zip',
+            'href': 'https://example.com/U_Bench_' + str(n) + '_STIG.zip',
+            'date': '27 Oct 2022',
+            'fileType': 'manual',
+            'fileContent': os.urandom(100).hex() if content else None,
+        }
+
+# The loop update_content ran before batching, over a list holding the whole library
+def per_row(count):
+
+    con = sqlite3.connect('data/per_row.db')
+    cur = con.cursor()
+    cur.execute("CREATE TABLE xccdf_content([stigId] TEXT PRIMARY KEY, [fileName] TEXT, [zipFolder] TEXT, [href] TEXT, [date] TEXT, [fileType] TEXT, [fileContent] BLOB)")
+    data = list(rows(count))
+    for row in data:
+        q = """
+        INSERT OR REPLACE INTO xccdf_content VALUES(
+            :stigId,
+            :fileName,
+            :zipFolder,
+            :href,
+            :date,
+            :fileType,
+            :fileContent
+        )"""
+        cur.execute(q, row)
+    con.commit()
+    con.close()
+
+def batched(count):
+
+    db = db_management.stig()
+    db.update_content(rows(count))
+    db.con.close()
+
+# Batched writes alone, without hashing and compressing content into the blob store
+def batched_rows(count):
+
+    db = db_management.stig()
+    db.update_content(rows(count, content = False))
+    db.con.close()
+
+# Time and peak traced memory are measured in separate runs, tracing slows Python code down
+def measure(fn, count):
+
+    with workspace():
+        start = time.perf_counter()
+        fn(count)
+        elapsed = time.perf_counter() - start
+    with workspace():
+        tracemalloc.start()
+        fn(count)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    return elapsed, peak
+
+if __name__ == '__main__':
+
+    for count in [10000, 100000]:
+        for name, fn in [('per row', per_row), ('batched', batched_rows), ('batched + blob store', batched)]:
+            elapsed, peak = measure(fn, count)
+            print(str(count).rjust(6) + " rows  " + name.ljust(21) + str(round(elapsed, 2)).rjust(6) + "s  peak " + str(round(peak/1024/1024, 1)) + " MB")
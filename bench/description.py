@@ -0,0 +1,45 @@
+"""
+Rule description parsing, one scan against eleven (user-011)
+
+Times parse_description against the eleven find_between
+calls parse_xccdf made per rule, on single descriptions
+of growing size and on every rule of a large benchmark.
+Both must return the same fields.
+
+    python bench/description.py
+"""
+
+import timeit
+from fixtures import description
+from modules import stig_management
+
+# The helper parse_xccdf called once per field before parse_description
+# Credit for the find_between function goes to pkeech at https://github.com/pkeech/stig_parser
+def find_between(s, first, last):
+    try:
+        start = s.index(first) + len(first)
+        end = s.index(last, start)
+        return s[start:end]
+    except ValueError:
+        return ""
+
+def per_field(text):
+    return {field: find_between(text, '<' + field + '>', '</' + field + '>') for field in stig_management.descriptionFields}
+
+def best(fn, texts, number):
+    return min(timeit.repeat(lambda: [fn(t) for t in texts], number = number, repeat = 5))/number
+
+if __name__ == '__main__':
+
+    for size in [500, 5000, 50000]:
+        texts = [description(size, n) for n in range(50)]
+        assert [per_field(t) for t in texts] == [stig_management.parse_description(t) for t in texts]
+        old = best(per_field, texts, 20)
+        new = best(stig_management.parse_description, texts, 20)
+        print(str(size).rjust(6) + " characters  find_between " + str(round(old/len(texts)*1e6, 1)).rjust(6) + "us  single scan " + str(round(new/len(texts)*1e6, 1)).rjust(6) + "us  " + str(round(old/new, 2)) + "x")
+
+    # Descriptions of a benchmark the size of the largest DISA releases
+    texts = [description(n % 4000, n) for n in range(2000)]
+    old = best(per_field, texts, 3)
+    new = best(stig_management.parse_description, texts, 3)
+    print("2000 rules   find_between " + str(round(old*1000, 1)) + "ms  single scan " + str(round(new*1000, 1)) + "ms  " + str(round(old/new, 2)) + "x")
@@ -0,0 +1,107 @@
+"""
+Synthetic STIG content for the benchmarks
+
+Benchmarks are generated in the layout of DISA xccdf
+releases so the numbers do not depend on content that
+has to be downloaded from the DoD Cyber Exchange. Every
+benchmark runs in a scratch directory with its own data
+folder, nothing is written to the repository.
+"""
+
+import io
+import os
+import sys
+import time
+import random
+import shutil
+import tempfile
+from zipfile import ZipFile, ZIP_DEFLATED
+
+# Benchmarks run as plain scripts from any directory
+repoDir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if repoDir not in sys.path:
+    sys.path.insert(0, repoDir)
+
+descriptionFields = ['VulnDiscussion', 'FalsePositives', 'FalseNegatives', 'Documentable', 'Mitigations', 'SeverityOverrideGuidance', 'PotentialImpacts', 'ThirdPartyTools', 'MitigationControl', 'Responsibility', 'IAControls']
+
+# Rule description with every pseudo-xml field, discussion padded to roughly size characters
+def description(size = 400, seed = 0):
+
+    r = random.Random(seed)
+    words = ['the', 'system', 'must', 'audit', 'account', 'logon', '<b>', '&amp;', 'events', 'policy']
+    discussion = []
+    while sum([len(w) + 1 for w in discussion]) < size:
+        discussion.append(r.choice(words))
+    fields = dict.fromkeys(descriptionFields, '')
+    fields['VulnDiscussion'] = ' '.join(discussion)
+    fields['Documentable'] = 'false'
+    fields['Responsibility'] = 'System Administrator'
+
+    return ''.join(['<' + f + '>' + fields[f] + '</' + f + '>' for f in descriptionFields])
+
+def escape(text):
+    return text.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
+
+# Manual xccdf benchmark with the given number of rules
+def xccdf(stigId = 'Test_STIG', rules = 300, seed = 0, descriptionSize = 400):
+
+    r = random.Random(seed)
+    out = [
+        '<?xml version="1.0" encoding="utf-8"?><?xml-stylesheet type=\'text/xsl\' href=\'STIG_unclass.xsl\'?>',
+        '<Benchmark xmlns:dc="http://purl.org/dc/elements/1.1/" xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" xmlns="http://checklists.nist.gov/xccdf/1.1" id="' + stigId + '" xml:lang="en">',
+        '<status date="2022-09-21">accepted</status><title>' + stigId.replace('_', ' ') + ' Security Technical Implementation Guide</title><description>Synthetic benchmark</description>',
+        '<reference href="https://cyber.mil"><dc:publisher>DISA</dc:publisher><dc:source>STIG.DOD.MIL</dc:source></reference>',
+        '<plain-text id="release-info">Release: 7 Benchmark Date: 27 Oct 2022</plain-text><version>2</version>',
+        '<Profile id="MAC-1_Classified"><title>I - Mission Critical Classified</title><description>&lt;ProfileDescription&gt;&lt;/ProfileDescription&gt;</description>',
+    ]
+    for g in range(rules):
+        out.append('<select idref="V-' + str(200000 + g) + '" selected="true" />')
+    out.append('</Profile>')
+    for g in range(rules):
+        vid = 'V-' + str(200000 + g)
+        ccis = ''.join(['<ident system="http://cyber.mil/cci">CCI-' + str(r.randint(1, 3000)).zfill(6) + '</ident>' for i in range(r.randint(1, 2))])
+        out.append('<Group id="' + vid + '"><title>SRG-OS-' + str(g).zfill(6) + '-GPOS-00001</title><description>&lt;GroupDescription&gt;&lt;/GroupDescription&gt;</description>')
+        out.append('<Rule id="SV-' + str(300000 + g) + 'r' + str(r.randint(1, 5)) + '_rule" weight="10.0" severity="' + ['low', 'medium', 'high'][g % 3] + '"><version>TEST-00-' + str(g).zfill(6) + '</version>')
+        out.append('<title>Rule ' + str(g) + ' must be &lt;set&gt;.</title><description>' + escape(description(descriptionSize, g)) + '</description>')
+        out.append('<reference><dc:title>DPMS Target</dc:title><dc:publisher>DISA</dc:publisher><dc:type>DPMS Target</dc:type><dc:subject>Test</dc:subject><dc:identifier>2885</dc:identifier></reference>')
+        out.append('<ident system="http://cyber.mil/legacy">V-' + str(60000 + g) + '</ident>' + ccis)
+        out.append('<fixtext fixref="F-' + str(g) + '_fix">Configure the setting ' + str(g) + '.</fixtext><fix id="F-' + str(g) + '_fix" />')
+        out.append('<check system="C-' + str(g) + '_chk"><check-content-ref href="Test_Manual-xccdf.xml" name="M" /><check-content>Verify the setting ' + str(g) + '.</check-content></check></Rule></Group>')
+    out.append('</Benchmark>')
+
+    return '\n'.join(out).encode('utf-8')
+
+# DISA style archive holding a manual benchmark
+def stig_zip(stigId, rules = 300, seed = 0):
+
+    buf = io.BytesIO()
+    with ZipFile(buf, 'w', ZIP_DEFLATED) as z:
+        z.writestr(stigId + '/U_' + stigId + '_Manual-xccdf.xml', xccdf(stigId, rules, seed))
+        z.writestr(stigId + '/U_' + stigId + '_Readme.txt', b'Synthetic release')
+
+    return buf.getvalue()
+
+# Run inside a scratch directory with an empty data folder
+class workspace:
+
+    def __enter__(self):
+        self.cwd = os.getcwd()
+        self.path = tempfile.mkdtemp()
+        os.chdir(self.path)
+        os.mkdir('data')
+        return self.path
+
+    def __exit__(self, *args):
+        os.chdir(self.cwd)
+        shutil.rmtree(self.path, ignore_errors = True)
+
+# Best wall time of several runs of fn
+def best_of(fn, repeat = 3):
+
+    times = []
+    for n in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+
+    return min(times)
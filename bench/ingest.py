@@ -0,0 +1,50 @@
+"""
+Ingest speedup by worker process count (user-003)
+
+Serves synthetic DISA archives from a local HTTP server
+and runs stig_repo.ingest, which downloads on a thread
+pool while member classification runs in a process
+pool. Speedup is relative to a single process.
+
+    python bench/ingest.py [archives] [rules]
+"""
+
+import io
+import os
+import sys
+import time
+from contextlib import redirect_stdout
+from fixtures import stig_zip, workspace
+from modules import stig_management
+from tests import http_fixture
+
+def run(site, names, processes):
+
+    repo = stig_management.stig_repo('repo', 'Bench')
+    repo.content = {name: {'href': site.url + '/' + name, 'date': '27 Oct 2022'} for name in names}
+    start = time.perf_counter()
+    with redirect_stdout(io.StringIO()):
+        rows = len([row for row in repo.ingest(names, workers = 8, processes = processes) if not row.get('synced')])
+    elapsed = time.perf_counter() - start
+    repo.db.con.close()
+    repo.assets.con.close()
+
+    return rows, elapsed
+
+if __name__ == '__main__':
+
+    archives = int(sys.argv[1]) if len(sys.argv) > 1 else 40
+    rules = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+    names = ['U_Test_' + str(n) + '_STIG.zip' for n in range(archives)]
+    site = http_fixture.site({'/' + name: stig_zip('Test_' + str(n), rules, n) for n, name in enumerate(names)})
+    counts = sorted(set([1, 2, 4, os.cpu_count() or 1]))
+
+    print(str(archives) + " archives of " + str(rules) + " rules, " + str(os.cpu_count()) + " cpu(s)")
+    with workspace():
+        os.mkdir('repo')
+        base = None
+        for processes in counts:
+            rows, elapsed = run(site, names, processes)
+            base = base or elapsed
+            print("processes " + str(processes).rjust(2) + "  " + str(round(elapsed, 2)).rjust(6) + "s  speedup " + str(round(base/elapsed, 2)) + "x  rows " + str(rows))
+    site.close()
@@ -0,0 +1,75 @@
+"""
+Repository scan for sort and report (user-017)
+
+Builds a synthetic STIG repository of checklists and other
+files, then times parse_ckl against scan_ckl on a single
+checklist, a cold index of every checklist by worker count,
+a rescan with nothing changed, and a dry run sort planned
+from the index.
+
+    python bench/repo_scan.py [checklists] [rules]
+"""
+
+import io
+import os
+import sys
+import time
+from contextlib import redirect_stdout
+from fixtures import xccdf, workspace, best_of
+from modules import stig_management
+
+def build(root, checklists, rules):
+
+    xccdf_dict = stig_management.parse_xccdf('U_Bench_STIG_Manual-xccdf.xml', xccdf('Bench_STIG', rules))
+    for n in range(checklists):
+        folder = os.path.join(root, 'incoming', 'site' + str(n % 20))
+        os.makedirs(folder, exist_ok = True)
+        host_data = stig_management.default_host_data()
+        host_data['HOST_NAME'] = 'host' + str(n)
+        with open(os.path.join(folder, stig_management.name_xccdf_ckl(xccdf_dict, host_data)), 'w', encoding = 'UTF-8', newline = '') as f:
+            stig_management.write_ckl(xccdf_dict, f, host_data)
+
+        # Documents and other files the scan has to walk past
+        with open(os.path.join(folder, 'notes' + str(n) + '.txt'), 'w') as f:
+            f.write('notes')
+
+def timed(fn, *args, **kwargs):
+
+    start = time.perf_counter()
+    with redirect_stdout(io.StringIO()):
+        fn(*args, **kwargs)
+
+    return time.perf_counter() - start
+
+if __name__ == '__main__':
+
+    checklists = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    rules = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    counts = sorted(set([1, 2, 4, os.cpu_count() or 1]))
+
+    print(str(checklists) + " checklists of " + str(rules) + " rules, " + str(os.cpu_count()) + " cpu(s)")
+    with workspace():
+        os.mkdir('repo')
+        build('repo', checklists, rules)
+        fPath = next(p for p, size, mtime in stig_management.scan_files('repo') if p.endswith('.ckl'))
+        with open(fPath, encoding = 'UTF-8') as f:
+            text = f.read()
+        print("parse_ckl, one checklist  " + str(round(best_of(lambda: stig_management.parse_ckl(text), 20)*1000, 1)) + "ms")
+        print("scan_ckl, one checklist   " + str(round(best_of(lambda: stig_management.scan_ckl(fPath, vulns = True), 20)*1000, 1)) + "ms")
+        base = None
+        for workers in counts:
+            for suffix in ['', '-wal', '-shm']:
+                if os.path.exists(os.path.join('data', 'Bench.db' + suffix)):
+                    os.remove(os.path.join('data', 'Bench.db' + suffix))
+            repo = stig_management.stig_repo('repo', 'Bench')
+            elapsed = timed(repo.update_index, workers)
+            base = base or elapsed
+            print("index, workers " + str(workers).rjust(2) + "  " + str(round(elapsed, 2)).rjust(6) + "s  speedup " + str(round(base/elapsed, 2)) + "x")
+            repo.db.con.close()
+            repo.assets.con.close()
+
+        repo = stig_management.stig_repo('repo', 'Bench')
+        print("rescan, nothing changed  " + str(round(timed(repo.update_index), 2)) + "s")
+        print("sort, dry run            " + str(round(timed(repo.sort, dryRun = True), 2)) + "s")
+        repo.db.con.close()
+        repo.assets.con.close()
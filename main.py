@@ -1,4 +1,5 @@
-print("""
+if __name__ == "__main__":
+  print("""
 ==================================================================
  __  __     ______     ______     __  __     __  __     ______    
 /\ \/ /    /\  __ \   /\  ___\   /\ \/\ \   /\ \_\ \   /\  __ \   
@@ -32,33 +33,36 @@ The project is licensed under the MIT license.
 # Import external libraries
 from modules import system
 
-# Import environmental variables
-print("Importing environmental variables...")
-app = system.environment()
-app.check_env("Information System Name")
-print("Complete!")
+# Worker processes import this module as well, so only run the menu when launched directly
+if __name__ == "__main__":
 
-# Main menu
-while True:
+  # Import environmental variables
+  print("Importing environmental variables...")
+  app = system.environment()
+  app.check_env("Information System Name")
+  print("Complete!")
 
-  # Create menu options
-  options = {
-    1: 'STIG Management',
-    2: 'Update System Variables',
-    3: 'Exit',
-  }
-  choice = system.menu('MAIN', options)
+  # Main menu
+  while True:
 
-  # Quit program
-  if options[int(choice)] == 'Exit':
-    print("\nGoodbye!")
-    break
+    # Create menu options
+    options = {
+      1: 'STIG Management',
+      2: 'Update System Variables',
+      3: 'Exit',
+    }
+    choice = system.menu('MAIN', options)
 
-  # Manage STIG content
-  elif options[int(choice)] == 'STIG Management':
-    from modules import stig_management
-    stig_management.menu(app)
+    # Quit program
+    if options[int(choice)] == 'Exit':
+      print("\nGoodbye!")
+      break
 
-  # Account for changes to system
-  elif options[int(choice)] == 'Update System Variables':
-    app.update_env()
\ No newline at end of file
+    # Manage STIG content
+    elif options[int(choice)] == 'STIG Management':
+      from modules import stig_management
+      stig_management.menu(app)
+
+    # Account for changes to system
+    elif options[int(choice)] == 'Update System Variables':
+      app.update_env()
\ No newline at end of file
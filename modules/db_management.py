@@ -11,17 +11,48 @@ System database.
 """
 
 # Import external libraries
+import os
+import time
 import sqlite3
+import hashlib
+import re
+import zlib
+import marshal
+from collections import OrderedDict
+from itertools import islice
+from functools import lru_cache
+try:
+    import zstandard # Optional, zlib is used when not installed
+except ImportError:
+    zstandard = None
+
+# Open a connection tuned for bulk writes
+def connect(name):
+
+    con = sqlite3.connect(name, cached_statements = 256)
+    con.execute("PRAGMA journal_mode = WAL")
+    con.execute("PRAGMA synchronous = NORMAL")
+    con.execute("PRAGMA cache_size = -65536")
+
+    return con
+
+# Columns of the xccdf_content table
+contentColumns = ['stigId', 'fileName', 'zipFolder', 'href', 'date', 'fileType', 'fileHash']
 
 # Making the STIG/SCAP xccdf content separate for portability
 class stig:
 
     def __init__(self):
         self.name = 'data/stig.db'
-        self.con = sqlite3.connect(self.name)
+        self.con = connect(self.name)
         self.cur = self.con.cursor()
 
+        # In-process cache of parsed benchmarks in front of xccdf_model
+        self.models = OrderedDict()
+        self.modelCacheSize = 32
+
         self.make_table()
+        self.migrate()
     
     # Create standard table
     def make_table(self):
@@ -35,50 +66,356 @@ class stig:
             [href] TEXT,
             [date] TEXT,
             [fileType] TEXT,
-            [fileContent] BLOB
+            [fileHash] TEXT
+        )
+        """
+        self.cur.execute(q)
+
+        # Index used for sync freshness checks
+        q = """
+        CREATE INDEX IF NOT EXISTS xccdf_content_sync
+        ON xccdf_content([zipFolder], [date])
+        """
+        self.cur.execute(q)
+
+        # Archives synced from the DoD Cyber Exchange, zips sharing a stigId with another zip are still remembered
+        q = "SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'xccdf_archive'"
+        backfill = not self.cur.execute(q).fetchone()
+        q = """
+        CREATE TABLE IF NOT EXISTS xccdf_archive(
+            [zipFolder] TEXT PRIMARY KEY,
+            [href] TEXT,
+            [date] TEXT
+        )
+        """
+        self.cur.execute(q)
+        if backfill:
+            q = """
+            INSERT OR IGNORE INTO xccdf_archive
+            SELECT zipFolder, href, MAX(date) FROM xccdf_content
+            WHERE zipFolder IS NOT NULL
+            GROUP BY zipFolder
+            """
+            self.cur.execute(q)
+
+        # Titles of each benchmark and its rules, source of the full-text search index
+        q = """
+        CREATE TABLE IF NOT EXISTS xccdf_title(
+            [id] INTEGER PRIMARY KEY,
+            [stigId] TEXT UNIQUE,
+            [fileName] TEXT,
+            [title] TEXT,
+            [ruleTitles] TEXT
+        )
+        """
+        self.cur.execute(q)
+
+        # Full-text search index kept in sync with xccdf_title by triggers
+        try:
+            q = """
+            CREATE VIRTUAL TABLE IF NOT EXISTS xccdf_search USING fts5(
+                stigId,
+                fileName,
+                title,
+                ruleTitles,
+                content = 'xccdf_title',
+                content_rowid = 'id'
+            )
+            """
+            self.cur.execute(q)
+            q = """
+            CREATE TRIGGER IF NOT EXISTS xccdf_title_insert AFTER INSERT ON xccdf_title BEGIN
+                INSERT INTO xccdf_search(rowid, stigId, fileName, title, ruleTitles)
+                VALUES(new.id, new.stigId, new.fileName, new.title, new.ruleTitles);
+            END
+            """
+            self.cur.execute(q)
+            q = """
+            CREATE TRIGGER IF NOT EXISTS xccdf_title_delete AFTER DELETE ON xccdf_title BEGIN
+                INSERT INTO xccdf_search(xccdf_search, rowid, stigId, fileName, title, ruleTitles)
+                VALUES('delete', old.id, old.stigId, old.fileName, old.title, old.ruleTitles);
+            END
+            """
+            self.cur.execute(q)
+            self.fts = True
+
+        # SQLite built without FTS5 falls back to LIKE searches
+        except sqlite3.OperationalError:
+            self.fts = False
+
+        # Parsed benchmarks serialized with marshal, keyed by stigId and content hash
+        q = """
+        CREATE TABLE IF NOT EXISTS xccdf_model(
+            [stigId] TEXT,
+            [fileHash] TEXT,
+            [format] INTEGER,
+            [model] BLOB,
+            PRIMARY KEY([stigId], [fileHash])
+        )
+        """
+        self.cur.execute(q)
+
+        # Compressed xccdf files stored once by SHA-256 of their uncompressed content
+        q = """
+        CREATE TABLE IF NOT EXISTS xccdf_blob(
+            [fileHash] TEXT PRIMARY KEY,
+            [codec] TEXT,
+            [size] INTEGER,
+            [content] BLOB
         )
         """
         self.cur.execute(q)
 
+        # DISA Control Correlation Identifiers
+        q = """
+        CREATE TABLE IF NOT EXISTS cci_item(
+            [cci] TEXT PRIMARY KEY,
+            [type] TEXT,
+            [status] TEXT,
+            [definition] TEXT
+        )
+        """
+        self.cur.execute(q)
+
+        # NIST SP 800-53 control of each CCI reference, precomputed for rollup joins
+        q = """
+        CREATE TABLE IF NOT EXISTS cci_control(
+            [cci] TEXT,
+            [revision] TEXT,
+            [control] TEXT,
+            [reference] TEXT,
+            PRIMARY KEY([cci], [revision], [reference])
+        ) WITHOUT ROWID
+        """
+        self.cur.execute(q)
+        q = """
+        CREATE INDEX IF NOT EXISTS cci_control_rollup
+        ON cci_control([revision], [cci], [control])
+        """
+        self.cur.execute(q)
+
         self.con.commit()
-    
-    # Insert content into xccdf_content table
-    def update_content(self, data):
+
+    # Convert a stig.db holding uncompressed fileContent to the blob store in place
+    # The legacy table is only dropped once every row is copied, an interrupted migration resumes on the next open
+    def migrate(self):
+
+        columns = [c[1] for c in self.cur.execute("PRAGMA table_info(xccdf_content)").fetchall()]
+        if 'fileContent' in columns:
+            self.cur.execute("ALTER TABLE xccdf_content RENAME TO xccdf_content_legacy")
+            self.make_table()
+        q = "SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'xccdf_content_legacy'"
+        if not self.cur.execute(q).fetchone():
+            return
+
+        # Stream legacy rows through the blob writer, rows copied before an interruption are replaced with themselves
+        print("\nMigrating " + self.name + " to compressed content storage...")
+        legacy = self.con.cursor()
+        legacy.execute("SELECT stigId, fileName, zipFolder, href, date, fileType, fileContent FROM xccdf_content_legacy")
+        keys = ['stigId', 'fileName', 'zipFolder', 'href', 'date', 'fileType', 'fileContent']
+        self.update_content(dict(zip(keys, row)) for row in legacy)
+
+        # Archives of the legacy rows stay synced even if xccdf_archive was created partway through a migration
+        q = """
+        INSERT OR IGNORE INTO xccdf_archive
+        SELECT zipFolder, href, MAX(date) FROM xccdf_content_legacy
+        WHERE zipFolder IS NOT NULL
+        GROUP BY zipFolder
+        """
+        self.cur.execute(q)
+
+        # The sync index went with the renamed table, create it again on the new one
+        self.cur.execute("DROP TABLE xccdf_content_legacy")
+        self.make_table()
+        self.con.commit()
+        self.cur.execute("VACUUM")
+        print("Complete!")
+
+    # Store xccdf content once, returning its hash
+    def store_blob(self, content):
+
+        if isinstance(content, str):
+            content = content.encode('utf-8')
+        fileHash = hashlib.sha256(content).hexdigest()
+
+        # Identical members of different zips are only compressed and stored once
+        q = "SELECT 1 FROM xccdf_blob WHERE [fileHash] = ?"
+        if not self.con.execute(q, (fileHash,)).fetchone():
+            if zstandard:
+                codec = 'zstd'
+                data = zstandard.ZstdCompressor(level = 10).compress(content)
+            else:
+                codec = 'zlib'
+                data = zlib.compress(content, 9)
+            q = "INSERT INTO xccdf_blob VALUES(?, ?, ?, ?)"
+            self.con.execute(q, (fileHash, codec, len(content), data))
+
+        return fileHash
+
+    # Decompress xccdf content by hash, only when it is actually needed
+    def fetch_blob(self, fileHash):
+
+        q = "SELECT codec, content FROM xccdf_blob WHERE [fileHash] = ?"
+        codec, data = self.con.execute(q, (fileHash,)).fetchone()
+        if codec == 'zstd':
+            content = zstandard.ZstdDecompressor().decompress(data)
+        else:
+            content = zlib.decompress(data)
+
+        return content
+
+    # Fetch a parsed benchmark from the in-process cache or xccdf_model
+    def fetch_model(self, stigId, fileHash):
+
+        key = (stigId, fileHash)
+        if key in self.models:
+            self.models.move_to_end(key)
+            return self.models[key]
+
+        q = """
+        SELECT model FROM xccdf_model
+        WHERE [stigId] = ?
+        AND [fileHash] = ?
+        AND [format] = ?
+        """
+        row = self.con.execute(q, (stigId, fileHash, marshal.version)).fetchone()
+        if row == None:
+            return None
+        model = marshal.loads(zlib.decompress(row[0]))
+        self.cache_model(key, model)
+
+        return model
+
+    # Store a parsed benchmark for later checklist generation
+    def store_model(self, stigId, fileHash, model):
+
+        q = "INSERT OR REPLACE INTO xccdf_model VALUES(?, ?, ?, ?)"
+        self.con.execute(q, (stigId, fileHash, marshal.version, zlib.compress(marshal.dumps(model), 1)))
+        self.con.commit()
+        self.cache_model((stigId, fileHash), model)
+
+    # Keep only the most recently used models in memory
+    def cache_model(self, key, model):
+
+        self.models[key] = model
+        self.models.move_to_end(key)
+        while len(self.models) > self.modelCacheSize:
+            self.models.popitem(last = False)
+
+    # Drop parsed models of content being replaced, once for a whole chunk of stigIds
+    def invalidate_models(self, stigIds):
+
+        self.con.executemany("DELETE FROM xccdf_model WHERE [stigId] = ?", [(s,) for s in stigIds])
+        for key in [k for k in self.models if k[0] in stigIds]:
+            del self.models[key]
+
+    # Replace the search titles of a benchmark
+    def update_titles(self, row):
+
+        self.con.execute("DELETE FROM xccdf_title WHERE [stigId] = :stigId", row)
+        q = """
+        INSERT INTO xccdf_title([stigId], [fileName], [title], [ruleTitles])
+        VALUES(:stigId, :fileName, :title, :ruleTitles)
+        """
+        self.con.execute(q, row)
+
+    # Content without search titles, e.g. stored before the index existed
+    def untitled_content(self):
+
+        q = """
+        SELECT c.stigId, c.fileName, c.fileHash FROM xccdf_content c
+        LEFT JOIN xccdf_title t ON t.stigId = c.stigId
+        WHERE c.fileHash IS NOT NULL
+        AND t.stigId IS NULL
+        """
+
+        return self.cur.execute(q).fetchall()
+
+    # Replace raw fileContent with a reference to the blob store and index titles
+    # Rows are yielded as tuples in the column order of xccdf_content, the caller's rows are left untouched
+    def prepare_rows(self, data):
 
         for row in data:
-            q = """
-            INSERT OR REPLACE INTO xccdf_content VALUES(
-                :stigId,
-                :fileName,
-                :zipFolder,
-                :href,
-                :date,
-                :fileType,
-                :fileContent
-            )"""
-            self.cur.execute(q, row)
 
+            # Marker following the last row of an archive, the archive is synced once its rows are stored
+            if row.get('synced'):
+                self.con.execute("INSERT OR REPLACE INTO xccdf_archive VALUES(:zipFolder, :href, :date)", row)
+                continue
+
+            content = row.get('fileContent')
+            if row['stigId'] and 'title' in row:
+                self.update_titles(row)
+            yield (row['stigId'], row['fileName'], row['zipFolder'], row['href'], row['date'], row['fileType'], self.store_blob(content) if content else None)
+
+    # Insert content into xccdf_content table, data may be any iterable including a generator
+    def update_content(self, data, chunkSize = 5000):
+
+        q = "INSERT OR REPLACE INTO xccdf_content VALUES(?, ?, ?, ?, ?, ?, ?)"
+
+        # Rows are consumed lazily and committed in chunks as they are produced, archive markers commit with them
+        data = self.prepare_rows(data)
+        while True:
+            chunk = list(islice(data, chunkSize))
+            if chunk:
+                self.invalidate_models(set([row[0] for row in chunk if row[0]]))
+                self.con.executemany(q, chunk)
+            self.con.commit()
+            if not chunk:
+                break
+        self.prune_blobs()
+
+    # Remove stored content no longer referenced by any xccdf_content row, e.g. of a replaced release
+    def prune_blobs(self):
+
+        q = """
+        DELETE FROM xccdf_blob
+        WHERE [fileHash] NOT IN (SELECT fileHash FROM xccdf_content WHERE fileHash IS NOT NULL)
+        """
+        self.con.execute(q)
         self.con.commit()
     
-    # Content selector
-    def select_content(self, benchmark = True):
+    # Ranked search over STIG ids, file names, benchmark and rule titles
+    def search_content(self, search, benchmark = True):
 
-        search = input("Enter the full or partial name of a STIG: ")
+        # Every word must match as a prefix, an empty search lists everything
+        words = re.findall(r'\w+', search)
+        data = {
+            'match': ' '.join('"' + w + '"*' for w in words),
+            'like': '%' + search + '%',
+        }
+        filters = "AND c.fileHash IS NOT NULL"
+        if not benchmark:
+            filters = filters + "\nAND c.fileName NOT LIKE '%benchmark%'"
 
-        if benchmark:
+        if not words:
+            q = """
+            SELECT c.stigId FROM xccdf_content c
+            WHERE 1 """ + filters + """
+            ORDER BY c.stigId
+            """
+        elif self.fts:
             q = """
-            SELECT stigId from xccdf_content
-            WHERE [stigId] LIKE "%_XXX_%"
-            AND [fileContent] IS NOT NULL
-            """.replace('_XXX_',search)
+            SELECT s.stigId FROM xccdf_search s
+            JOIN xccdf_content c ON c.stigId = s.stigId
+            WHERE xccdf_search MATCH :match
+            """ + filters + """
+            ORDER BY bm25(xccdf_search, 10.0, 5.0, 2.0, 1.0)
+            """
         else:
             q = """
-            SELECT stigId from xccdf_content
-            WHERE [stigId] LIKE "%_XXX_%"
-            AND [fileContent] IS NOT NULL
-            AND [fileName] NOT LIKE "%benchmark%"
-            """.replace('_XXX_',search)
-        options = [opt for sublist in self.cur.execute(q).fetchall() for opt in sublist] + [None]
+            SELECT c.stigId FROM xccdf_content c
+            WHERE c.stigId LIKE :like
+            """ + filters + """
+            ORDER BY c.stigId
+            """
+
+        return [row[0] for row in self.cur.execute(q, data).fetchall()]
+
+    # Content selector
+    def select_content(self, benchmark = True):
+
+        search = input("Enter the full or partial name of a STIG: ")
+        options = self.search_content(search, benchmark) + [None]
 
         # Display Options
         for x in range(len(options)):
@@ -95,65 +432,86 @@ class stig:
 
         return stigId
 
-    # Check if new updates available
-    def check_updates(self, zipFolder, date):
-        
-        # Query database for matching zipFolder
-        data = {
-            'zipFolder': zipFolder,
-            'date': date,
-        }
-        q = """
-        SELECT zipFolder, date FROM xccdf_content
-        WHERE [zipFolder] = :zipFolder
-        AND [date] = :date
-        """
-        results = self.cur.execute(q, data).fetchall()
+    # Replace the CCI list with items of (cci, type, status, definition, [(revision, control, reference)])
+    def import_cci(self, items, chunkSize = 1000):
 
-        # If results are returned, then local db matches online content
-        if results:
-            update = False
-        else:
-            update = True
-        
-        return update
+        self.cur.execute("DELETE FROM cci_item")
+        self.cur.execute("DELETE FROM cci_control")
+        count = 0
+        while True:
+            chunk = list(islice(items, chunkSize))
+            if not chunk:
+                break
+            self.cur.executemany("INSERT OR REPLACE INTO cci_item VALUES(?, ?, ?, ?)", [item[:4] for item in chunk])
+            q = "INSERT OR REPLACE INTO cci_control VALUES(?, ?, ?, ?)"
+            self.cur.executemany(q, [(item[0],) + ref for item in chunk for ref in item[4]])
+            count = count + len(chunk)
+        self.con.commit()
+
+        return count
+
+    # Load every synced (zipFolder, date) pair in a single query
+    def fetch_manifest(self):
+
+        q = "SELECT zipFolder, date FROM xccdf_archive"
+        manifest = {}
+        for zipFolder, date in self.cur.execute(q):
+            manifest.setdefault(zipFolder, set()).add(date)
+
+        return manifest
     
-    # Query local database for content
+    # Query local database for content, returning a cursor of sqlite3.Row
     def fetch_content(self, columns = ['*'], conditions = None):
 
-        # Build query
-        if columns[0] == '*' and conditions == None:
-            q = "SELECT * FROM xccdf_content"
+        # Conditions map a column to a single value or to a list of values
+        conditions = conditions or {}
+        shape = tuple((col, len(v) if isinstance(v, (list, tuple, set)) else None) for col, v in conditions.items())
+        q = content_query(tuple(columns), shape)
+        params = []
+        for col, v in conditions.items():
+            if isinstance(v, (list, tuple, set)):
+                params.extend(v)
+            else:
+                params.append(v)
+
+        # Identical query text reuses the connection's prepared statement
+        cur = self.con.cursor()
+        cur.row_factory = sqlite3.Row
+
+        return cur.execute(q, params)
+
+# Build a parameterized xccdf_content query from its shape
+@lru_cache(maxsize = 128)
+def content_query(columns, conditions):
+
+    # Only known column names may be interpolated into the query
+    for col in [c for c in columns if c != '*'] + [col for col, n in conditions]:
+        if col not in contentColumns:
+            raise ValueError("Unknown xccdf_content column '" + str(col) + "'")
+
+    q = "SELECT " + ', '.join(c if c == '*' else '[' + c + ']' for c in columns) + " FROM xccdf_content"
+    where = []
+    for col, n in conditions:
+        if n == None:
+            where.append("[" + col + "] = ?")
+        elif n == 0:
+            where.append("0")
         else:
-            q = "SELECT "
-            
-            # Add columns
-            for i in range(len(columns)):
-                if i == len(columns) - 1:
-                    q = q + columns[i]
-                else:
-                    q = q + columns[i] + ', '
-            q = q + ' FROM xccdf_content'
-            
-            # Add conditions
-            if conditions:
-                first_condition = True
-                for col in conditions:
-                    if first_condition:
-                        q = q + "\nWHERE [" + str(col) + "] = '" + str(conditions[col]) + "'"
-                        first_condition = False
-                    else:
-                        q = q + "\nAND [" + str(col) + "] = '" + str(conditions[col]) + "'"
-        rows = self.cur.execute(q).fetchall()
-
-        return rows
+            where.append("[" + col + "] IN (" + ', '.join(['?']*n) + ")")
+    if where:
+        q = q + "\nWHERE " + "\nAND ".join(where)
+
+    return q
 
 # Store data on system assets
 class asset:
 
+    # Bumped whenever indexed checklists must be scanned again to fill new tables
+    schemaVersion = 1
+
     def __init__(self, systemName):
         self.name = 'data/' + str(systemName) + '.db'
-        self.con = sqlite3.connect(self.name)
+        self.con = connect(self.name)
         self.cur = self.con.cursor()
 
         self.make_table()
@@ -161,15 +519,100 @@ class asset:
     # Create standard table
     def make_table(self):
 
-        # Asset table with cpe as foreign key to platform
+        # Checklist index, files are only parsed again when size, mtime and hash change
         q = """
         CREATE TABLE IF NOT EXISTS stig_ckls(
             [file_path] TEXT PRIMARY KEY,
+            [size] INTEGER,
+            [mtime] REAL,
+            [hash] TEXT,
             [hostname] TEXT,
             [fqdn] TEXT,
             [ip] TEXT,
             [stig_id] TEXT,
             [status] TEXT,
+            [not_reviewed] INTEGER,
+            [not_a_finding] INTEGER,
+            [not_applicable] INTEGER,
+            [open] INTEGER,
+            [missing_details] INTEGER,
+            [missing_comments] INTEGER
+        )
+        """
+        self.cur.execute(q)
+
+        # Checklists indexed by an older schema are scanned again to fill the newer tables
+        if self.cur.execute("PRAGMA user_version").fetchone()[0] < self.schemaVersion:
+            self.cur.execute("DELETE FROM stig_ckls")
+            self.cur.execute("PRAGMA user_version = " + str(self.schemaVersion))
+
+        # Finding counts of each checklist by severity and status
+        q = """
+        CREATE TABLE IF NOT EXISTS stig_ckl_severity(
+            [file_path] TEXT,
+            [severity] TEXT,
+            [status] TEXT,
+            [count] INTEGER,
+            PRIMARY KEY([file_path], [severity], [status])
+        )
+        """
+        self.cur.execute(q)
+
+        # One row per rule of each checklist, cci holds the space separated CCI_REF of the rule
+        q = """
+        CREATE TABLE IF NOT EXISTS findings(
+            [file_path] TEXT,
+            [host] TEXT,
+            [stig_id] TEXT,
+            [vuln_num] TEXT,
+            [rule_id] TEXT,
+            [severity] TEXT,
+            [status] TEXT,
+            [cci] TEXT,
+            [modified] REAL,
+            [imported] REAL,
+            PRIMARY KEY([file_path], [vuln_num])
+        ) WITHOUT ROWID
+        """
+        self.cur.execute(q)
+
+        # Covering indexes for rule, host and status questions across every checklist
+        self.cur.execute("CREATE INDEX IF NOT EXISTS findings_rule ON findings([stig_id], [vuln_num], [status], [host])")
+        self.cur.execute("CREATE INDEX IF NOT EXISTS findings_host ON findings([host], [status], [severity])")
+        self.cur.execute("CREATE INDEX IF NOT EXISTS findings_status ON findings([status], [severity], [stig_id], [vuln_num])")
+
+        # Each CCI_REF of a finding, the join key for control rollups
+        q = """
+        CREATE TABLE IF NOT EXISTS finding_cci(
+            [cci] TEXT,
+            [file_path] TEXT,
+            [vuln_num] TEXT,
+            PRIMARY KEY([cci], [file_path], [vuln_num])
+        ) WITHOUT ROWID
+        """
+        self.cur.execute(q)
+        self.cur.execute("CREATE INDEX IF NOT EXISTS finding_cci_path ON finding_cci([file_path])")
+
+        # Directories imported from outside the repository, included in control rollups
+        q = """
+        CREATE TABLE IF NOT EXISTS ckl_imports(
+            [directory] TEXT PRIMARY KEY,
+            [imported] REAL
+        )
+        """
+        self.cur.execute(q)
+
+        # Hosts named by checklist ASSET data, last imported checklist wins
+        q = """
+        CREATE TABLE IF NOT EXISTS assets(
+            [hostname] TEXT PRIMARY KEY,
+            [fqdn] TEXT,
+            [ip] TEXT,
+            [mac] TEXT,
+            [role] TEXT,
+            [asset_type] TEXT,
+            [marking] TEXT,
+            [tech_area] TEXT
         )
         """
         self.cur.execute(q)
@@ -213,19 +656,271 @@ class asset:
 
         self.con.commit()
 
-    # Import contents of checklist files
-    def import_ckl(self, ckl_dict):
+    # Import scanned checklists: summaries, severity counts, findings and host assets
+    def import_ckl(self, rows):
 
         q = """
-        INSERT OR REPLACE INTO assets
+        INSERT OR REPLACE INTO stig_ckls
         VALUES(
-            :filePath,
+            :file_path,
+            :size,
+            :mtime,
+            :hash,
             :hostname,
             :fqdn,
             :ip,
             :stig_id,
-            :status
+            :status,
+            :not_reviewed,
+            :not_a_finding,
+            :not_applicable,
+            :open,
+            :missing_details,
+            :missing_comments
         )"""
-        self.cur.execute(q, row)
+        rows = list(rows)
+        self.cur.executemany(q, rows)
+
+        # Replace the severity counts and findings of every imported checklist
+        paths = [(row['file_path'],) for row in rows]
+        self.cur.executemany("DELETE FROM stig_ckl_severity WHERE [file_path] = ?", paths)
+        self.cur.executemany("DELETE FROM findings WHERE [file_path] = ?", paths)
+        self.cur.executemany("DELETE FROM finding_cci WHERE [file_path] = ?", paths)
+        q = "INSERT INTO stig_ckl_severity VALUES(?, ?, ?, ?)"
+        self.cur.executemany(q, (
+            (row['file_path'], severity, status, row['severity'][severity][status])
+            for row in rows for severity in row.get('severity', {}) for status in row['severity'][severity]
+        ))
+        imported = time.time()
+        q = "INSERT OR REPLACE INTO findings VALUES(?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+        self.cur.executemany(q, (
+            (row['file_path'], row['hostname'], row['stig_id']) + vuln + (row['mtime'], imported)
+            for row in rows for vuln in row.get('vulns', [])
+        ))
+        q = "INSERT OR IGNORE INTO finding_cci VALUES(?, ?, ?)"
+        self.cur.executemany(q, (
+            (cci, row['file_path'], vuln[0])
+            for row in rows for vuln in row.get('vulns', []) for cci in vuln[4].split()
+        ))
+
+        # Hosts are keyed by name, checklists without one are templates
+        q = "INSERT OR REPLACE INTO assets VALUES(?, ?, ?, ?, ?, ?, ?, ?)"
+        self.cur.executemany(q, (
+            tuple(row['asset'].get(k) for k in ['HOST_NAME', 'HOST_FQDN', 'HOST_IP', 'HOST_MAC', 'ROLE', 'ASSET_TYPE', 'MARKING', 'TECH_AREA'])
+            for row in rows if row.get('asset', {}).get('HOST_NAME')
+        ))
+
+        self.con.commit()
+
+    # Remember a directory of imported checklists
+    def add_import(self, directory):
+
+        self.cur.execute("INSERT OR REPLACE INTO ckl_imports VALUES(?, ?)", (directory, time.time()))
+        self.con.commit()
+
+    # Every directory checklists were imported from
+    def fetch_imports(self):
+
+        return [row[0] for row in self.cur.execute("SELECT [directory] FROM ckl_imports ORDER BY [directory]")]
+
+    # Size, mtime and hash of every indexed checklist, optionally below a directory
+    def fetch_index(self, directory = None):
+
+        q = "SELECT file_path, size, mtime, hash FROM stig_ckls"
+        params = ()
+        if directory:
+            q = q + " WHERE [file_path] >= ? AND [file_path] < ?"
+            params = path_range(directory)
+
+        return {row[0]: row[1:] for row in self.cur.execute(q, params)}
+
+    # Record a new size and mtime for a checklist whose content did not change
+    def touch_ckl(self, file_path, size, mtime):
+
+        q = "UPDATE stig_ckls SET [size] = ?, [mtime] = ? WHERE [file_path] = ?"
+        self.cur.execute(q, (size, mtime, file_path))
+
+    # Follow a checklist to its new location
+    def move_ckl(self, src, des):
+
+        for table in ['stig_ckls', 'stig_ckl_severity', 'findings', 'finding_cci']:
+            self.cur.execute("DELETE FROM " + table + " WHERE [file_path] = ?", (des,))
+            self.cur.execute("UPDATE " + table + " SET [file_path] = ? WHERE [file_path] = ?", (des, src))
+
+    # Forget checklists which no longer exist
+    def remove_ckls(self, paths):
+
+        for table in ['stig_ckls', 'stig_ckl_severity', 'findings', 'finding_cci']:
+            self.cur.executemany("DELETE FROM " + table + " WHERE [file_path] = ?", [(p,) for p in paths])
+        self.con.commit()
+
+    # Indexed checklist summaries
+    def fetch_ckls(self):
+
+        cur = self.con.cursor()
+        cur.row_factory = sqlite3.Row
+
+        return cur.execute("SELECT * FROM stig_ckls")
+
+    # Count checklists per STIG below a directory, using the primary key as a range
+    def tally_ckls(self, directory, unique = False):
+
+        low, high = path_range(directory)
+        q = """
+        SELECT stig_id, """ + ("COUNT(DISTINCT hash)" if unique else "COUNT(*)") + """ FROM stig_ckls
+        WHERE [file_path] >= ? AND [file_path] < ?
+        GROUP BY stig_id
+        ORDER BY stig_id
+        """
+
+        return dict(self.cur.execute(q, (low, high)).fetchall())
+
+    # Checklists to summarize, optionally below some directories and keeping one checklist per hash
+    def ckl_source(self, directories = None, unique = False):
+
+        q = "SELECT *, MIN([file_path]) FROM stig_ckls" if unique else "SELECT * FROM stig_ckls"
+        params = ()
+        if directories:
+            where, params = path_filter('[file_path]', directories)
+            q = q + " WHERE " + where
+        if unique:
+            q = q + " GROUP BY [hash]"
+
+        return "(" + q + ")", params
+
+    # Checklist and finding counts grouped by host, STIG or checklist status
+    def summarize_ckls(self, column, directories = None, unique = False):
+
+        if column not in ['hostname', 'stig_id', 'status']:
+            raise ValueError(str(column) + " is not a summary column")
+        source, params = self.ckl_source(directories, unique)
+        q = """
+        SELECT [""" + column + """], COUNT(*), SUM([not_reviewed]), SUM([open]), SUM([not_a_finding]),
+            SUM([not_applicable]), SUM([missing_details]), SUM([missing_comments])
+        FROM """ + source + """
+        GROUP BY [""" + column + """]
+        ORDER BY [""" + column + """]
+        """
+
+        return self.cur.execute(q, params).fetchall()
+
+    # Finding counts by severity, one column per status
+    def summarize_severity(self, directories = None, unique = False):
+
+        source, params = self.ckl_source(directories, unique)
+        q = """
+        SELECT s.[severity],
+            SUM(CASE WHEN s.[status] = 'Not_Reviewed' THEN s.[count] ELSE 0 END),
+            SUM(CASE WHEN s.[status] = 'Open' THEN s.[count] ELSE 0 END),
+            SUM(CASE WHEN s.[status] = 'NotAFinding' THEN s.[count] ELSE 0 END),
+            SUM(CASE WHEN s.[status] = 'Not_Applicable' THEN s.[count] ELSE 0 END)
+        FROM stig_ckl_severity s JOIN """ + source + """ c ON c.[file_path] = s.[file_path]
+        GROUP BY s.[severity]
+        ORDER BY CASE s.[severity] WHEN 'high' THEN 0 WHEN 'medium' THEN 1 WHEN 'low' THEN 2 ELSE 3 END
+        """
+
+        return self.cur.execute(q, params).fetchall()
+
+    # Findings of one rule across every host, optionally only those with a status
+    def rule_findings(self, stig_id, vuln_num, status = None):
+
+        cur = self.con.cursor()
+        cur.row_factory = sqlite3.Row
+        q = "SELECT * FROM findings WHERE [stig_id] = ? AND [vuln_num] = ?"
+        params = (stig_id, vuln_num)
+        if status:
+            q = q + " AND [status] = ?"
+            params = params + (status,)
+
+        return cur.execute(q + " ORDER BY [host]", params)
+
+    # Hosts with a status on a rule, answered from the findings_rule index alone
+    def rule_hosts(self, stig_id, vuln_num, status = 'Open'):
+
+        q = "SELECT DISTINCT [host] FROM findings WHERE [stig_id] = ? AND [vuln_num] = ? AND [status] = ? ORDER BY [host]"
+
+        return [row[0] for row in self.cur.execute(q, (stig_id, vuln_num, status))]
+
+    # Every finding of a host, optionally only those with a status
+    def host_findings(self, host, status = None):
+
+        cur = self.con.cursor()
+        cur.row_factory = sqlite3.Row
+        q = "SELECT * FROM findings WHERE [host] = ?"
+        params = (host,)
+        if status:
+            q = q + " AND [status] = ?"
+            params = params + (status,)
+
+        return cur.execute(q + " ORDER BY [stig_id], [vuln_num]", params)
+
+    # Rules with a status and how many hosts share it, worst severity first
+    def status_rules(self, status = 'Open', severity = None):
+
+        q = """
+        SELECT [stig_id], [vuln_num], [severity], COUNT(DISTINCT [host]) FROM findings
+        WHERE [status] = ?""" + (" AND [severity] = ?" if severity else "") + """
+        GROUP BY [stig_id], [vuln_num], [severity]
+        ORDER BY CASE [severity] WHEN 'high' THEN 0 WHEN 'medium' THEN 1 WHEN 'low' THEN 2 ELSE 3 END, COUNT(DISTINCT [host]) DESC, [stig_id], [vuln_num]
+        """
+
+        return self.cur.execute(q, (status, severity) if severity else (status,)).fetchall()
+
+    # Finding status rolled up per NIST SP 800-53 control through the CCI list of a content database
+    def rollup_controls(self, contentName = 'data/stig.db', revision = '4', directories = None):
+
+        # The CCI tables live with the STIG content, attach them once
+        if 'content' not in [row[1] for row in self.cur.execute("PRAGMA database_list")]:
+            self.cur.execute("ATTACH DATABASE ? AS content", (contentName,))
+
+        params = (revision,)
+        where = ""
+        if directories:
+            where, paths = path_filter('f.[file_path]', directories)
+            where = " AND " + where
+            params = params + paths
+
+        # A finding counts once per control however many of its CCIs map there
+        q = """
+        SELECT [control], COUNT(DISTINCT [host]), COUNT(*),
+            SUM([status] = 'Open'), SUM([status] = 'Not_Reviewed'), SUM([status] = 'NotAFinding'), SUM([status] = 'Not_Applicable'),
+            CASE
+                WHEN SUM([status] = 'Open') > 0 THEN 'Non-Compliant'
+                WHEN SUM([status] = 'Not_Reviewed') > 0 THEN 'Not Reviewed'
+                WHEN SUM([status] = 'NotAFinding') > 0 THEN 'Compliant'
+                ELSE 'Not Applicable'
+            END
+        FROM (
+            SELECT DISTINCT m.[control], f.[file_path], f.[vuln_num], f.[host], f.[status]
+            FROM content.cci_control m
+            JOIN finding_cci c ON c.[cci] = m.[cci]
+            JOIN findings f ON f.[file_path] = c.[file_path] AND f.[vuln_num] = c.[vuln_num]
+            WHERE m.[revision] = ?""" + where + """
+        )
+        GROUP BY [control]
+        """
+        rows = self.cur.execute(q, params).fetchall()
+
+        return sorted(rows, key = lambda row: control_key(row[0]))
+
+# Sort key putting controls in family, number and enhancement order
+def control_key(control):
+
+    return [int(part) if part.isdigit() else part for part in re.split(r'(\d+)', str(control))]
+
+# Bounds of every path below a directory
+def path_range(directory):
+
+    low = os.path.join(directory, '')
+    high = low[:-1] + chr(ord(low[-1]) + 1)
+
+    return low, high
+
+# Condition matching paths below any of the directories, with its parameters
+def path_filter(column, directories):
+
+    params = ()
+    for directory in directories:
+        params = params + path_range(directory)
 
-        self.con.commit()
\ No newline at end of file
+    return "(" + " OR ".join([column + " >= ? AND " + column + " < ?"] * len(directories)) + ")", params
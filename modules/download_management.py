@@ -0,0 +1,241 @@
+"""
+KAGUYA -- Download Management
+
+Summary
+-------
+
+This feature handles fetching content from the DoD Cyber
+Exchange. Archives are downloaded concurrently over a
+pooled HTTP session and streamed to temporary files on
+disk. Interrupted transfers are resumed with HTTP Range
+requests on the next attempt, validated with If-Range
+against the response the partial file came from. Index
+pages are cached on disk and revalidated with
+conditional requests.
+"""
+
+# Import external libraries
+import os
+import time
+import json
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import requests # Comment this line out if using on an offline system
+from requests.adapters import HTTPAdapter # Comment this line out if using on an offline system
+
+# Concurrent, resumable download engine
+class downloader:
+
+    def __init__(self, workers = 8, retries = 3, backoff = 1, timeout = 60, chunkSize = 1024*1024, tempDir = os.path.join('data', 'downloads')):
+        self.workers = workers
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.chunkSize = chunkSize
+        self.tempDir = tempDir
+        if not os.path.exists(self.tempDir):
+            os.makedirs(self.tempDir)
+
+        # Share one connection pool between all worker threads
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections = workers, pool_maxsize = workers)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+        self.lock = threading.Lock()
+        self.stats = {
+            'files': 0,
+            'bytes': 0,
+            'failed': 0,
+            'start': None,
+        }
+
+    # Temporary file location is derived from the url so interrupted downloads can be resumed
+    def temp_path(self, url):
+        name = hashlib.sha1(url.encode('utf-8')).hexdigest()
+        ext = url.split('.')[-1].lower()
+
+        return os.path.join(self.tempDir, name + '.' + ext)
+
+    # Stream a single url to disk, resuming any partial download
+    def fetch(self, url):
+
+        fileName = self.temp_path(url)
+        part = fileName + '.part'
+        for attempt in range(self.retries + 1):
+
+            # Resume only a partial file whose validator the server can confirm with If-Range
+            meta = self.read_meta(part)
+            offset = os.path.getsize(part) if os.path.exists(part) else 0
+            headers = {}
+            if offset and meta.get('validator'):
+                headers = {'Range': 'bytes=' + str(offset) + '-', 'If-Range': meta['validator']}
+            elif offset:
+                self.discard(part)
+                offset = 0
+            try:
+                with self.session.get(url, headers = headers, stream = True, allow_redirects = False, timeout = self.timeout) as r:
+
+                    # Partial file already holds the whole archive, if it is as long as the archive was
+                    if r.status_code == 416 and offset:
+                        if meta.get('length') == offset:
+                            self.finish(part, fileName)
+                            return fileName
+                        self.discard(part)
+                        raise requests.exceptions.HTTPError('416 ' + url)
+
+                    # Server errors are worth another attempt, anything else is not downloadable
+                    if r.status_code >= 500:
+                        raise requests.exceptions.HTTPError(str(r.status_code) + ' ' + url)
+                    if r.status_code not in [200, 206]:
+                        break
+
+                    # A range that does not start where the partial file ends cannot be appended
+                    if r.status_code == 206:
+                        start, length = content_range(r.headers.get('Content-Range'))
+                        if start != offset or (meta.get('length') and length != meta['length']):
+                            self.discard(part)
+                            raise requests.exceptions.HTTPError('Content-Range mismatch ' + url)
+                        mode = 'ab'
+
+                    # Full response, the partial file is stale or the server ignored the range request
+                    else:
+                        mode = 'wb'
+                        self.write_meta(part, r)
+
+                    with open(part, mode) as f:
+                        for chunk in r.iter_content(chunk_size = self.chunkSize):
+                            f.write(chunk)
+                            with self.lock:
+                                self.stats['bytes'] += len(chunk)
+
+                self.finish(part, fileName)
+                return fileName
+
+            except (requests.exceptions.RequestException, OSError):
+                if attempt < self.retries:
+                    time.sleep(self.backoff * 2**attempt)
+
+        with self.lock:
+            self.stats['failed'] += 1
+
+        return None
+
+    # Validator and length of the response a partial file came from, kept beside it
+    def read_meta(self, part):
+        try:
+            with open(part + '.json', 'r') as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return {}
+
+    # Strong ETag first, Last-Modified otherwise, weak ETags cannot be used with If-Range
+    def write_meta(self, part, r):
+
+        etag = r.headers.get('ETag')
+        validator = etag if etag and not etag.startswith('W/') else r.headers.get('Last-Modified')
+        length = r.headers.get('Content-Length')
+        with open(part + '.json', 'w') as file:
+            json.dump({'validator': validator, 'length': int(length) if length and length.isdigit() else None}, file)
+
+    def discard(self, part):
+        for f in [part, part + '.json']:
+            if os.path.exists(f):
+                os.remove(f)
+
+    def finish(self, part, fileName):
+        os.replace(part, fileName)
+        if os.path.exists(part + '.json'):
+            os.remove(part + '.json')
+
+    # Download all urls concurrently, yielding (key, fileName) as each completes
+    def fetch_all(self, urls):
+
+        self.stats['start'] = time.time()
+        with ThreadPoolExecutor(max_workers = self.workers) as pool:
+            futures = {pool.submit(self.fetch, urls[key]): key for key in urls}
+            ptr = 0
+            for future in as_completed(futures):
+
+                # Update completion status
+                ptr = ptr + 1
+                self.stats['files'] = ptr
+                print(self.progress(ptr, len(futures)), end = "\r")
+
+                yield futures[future], future.result()
+
+    # Progress bar with throughput
+    def progress(self, ptr, total):
+
+        done = round((ptr/total)*100)
+        elapsed = max(time.time() - self.stats['start'], 0.001)
+        rate = self.stats['bytes']/elapsed/1024/1024
+
+        return "[" + "="*done + " "*(100 - done) + "] " + str(ptr) + "/" + str(total) + " " + str(round(rate, 2)) + " MB/s"
+
+    # Summary of the last run
+    def report(self):
+
+        elapsed = max(time.time() - self.stats['start'], 0.001) if self.stats['start'] else 0
+        size = self.stats['bytes']/1024/1024
+        rate = size/elapsed if elapsed else 0
+        print(
+            "\nDownloaded " + str(self.stats['files'] - self.stats['failed']) + " file(s), " + str(round(size, 2)) + " MB in " + str(round(elapsed, 2)) + "s (" + str(round(rate, 2)) + " MB/s)",
+            str(self.stats['failed']) + " download(s) failed and will be retried on the next sync",
+            sep = "\n"
+        )
+
+    def close(self):
+        self.session.close()
+
+# Start and total length of a Content-Range header such as 'bytes 100-199/200'
+def content_range(header):
+    try:
+        unit, spec = str(header).split(' ')
+        span, total = spec.split('/')
+        return int(span.split('-')[0]), None if total == '*' else int(total)
+    except ValueError:
+        return None, None
+
+# On-disk cache of index pages, revalidated with ETag and Last-Modified
+class index_cache:
+
+    def __init__(self, fileName = os.path.join('data', 'index_cache.json')):
+        self.fileName = fileName
+        try:
+            with open(self.fileName, 'r') as file:
+                self.cache = json.load(file)
+        except (OSError, ValueError):
+            self.cache = {}
+
+    # Return the cached content if the page is unchanged, otherwise the new response
+    def fetch(self, url, timeout = 60):
+
+        entry = self.cache.get(url)
+        headers = {}
+        if entry:
+            if entry['etag']:
+                headers['If-None-Match'] = entry['etag']
+            if entry['lastModified']:
+                headers['If-Modified-Since'] = entry['lastModified']
+
+        r = requests.get(url, headers = headers, timeout = timeout)
+        if r.status_code == 304 and entry:
+            return entry['content'], None
+
+        return None, r
+
+    # Remember the parsed content alongside the validators of the response it came from
+    # Only a 200 response is a complete page, anything else is never cached
+    def save(self, url, r, content):
+
+        if r.status_code != 200:
+            return
+        self.cache[url] = {
+            'etag': r.headers.get('ETag'),
+            'lastModified': r.headers.get('Last-Modified'),
+            'content': content,
+        }
+        with open(self.fileName, 'w') as file:
+            json.dump(self.cache, file)
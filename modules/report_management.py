@@ -0,0 +1,91 @@
+"""
+KAGUYA -- Report Management
+
+Summary
+-------
+
+This feature writes summary reports from tally data
+queried out of the Information System database. Each
+report is a set of named tables which can be written
+to CSV, JSON or XLSX. Workbooks are streamed with
+openpyxl in write-only mode so memory use does not
+grow with the number of rows.
+"""
+
+# Import external libraries
+import os
+import csv
+import json
+from openpyxl import Workbook
+
+# Write each table to its own CSV file named after the report
+def write_csv(tables, fileName):
+
+    saved = []
+    base = os.path.splitext(fileName)[0]
+    for name in tables:
+        columns, rows = tables[name]
+        path = base + '_' + name + '.csv'
+        with open(path, 'w', newline = '') as f:
+            writer = csv.writer(f)
+            writer.writerow(columns)
+            writer.writerows(rows)
+        saved.append(path)
+
+    return saved
+
+# Write every table to one JSON document as lists of records
+def write_json(tables, fileName):
+
+    with open(fileName, 'w') as f:
+        json.dump({name: [dict(zip(tables[name][0], row)) for row in tables[name][1]] for name in tables}, f, indent = 4)
+
+    return [fileName]
+
+# Stream every table to a sheet of an XLSX workbook
+def write_xlsx(tables, fileName):
+
+    wb = Workbook(write_only = True)
+    for name in tables:
+        columns, rows = tables[name]
+        ws = wb.create_sheet(name)
+        ws.append(columns)
+        for row in rows:
+            ws.append(list(row))
+    wb.save(fileName)
+
+    return [fileName]
+
+# Report writers by file extension
+writers = {
+    'csv': write_csv,
+    'json': write_json,
+    'xlsx': write_xlsx,
+}
+
+# Write a report in each requested format, returning every file saved
+def write_report(tables, fileName, formats = ('xlsx', 'csv', 'json')):
+
+    saved = []
+    base = os.path.splitext(fileName)[0]
+    for fmt in formats:
+        if fmt not in writers:
+            raise ValueError(str(fmt) + " is not a report format " + str(list(writers)))
+        saved = saved + writers[fmt](tables, base + '.' + fmt)
+
+    return saved
+
+# Print a table in fixed width columns
+def print_table(title, columns, rows):
+
+    widths = [len(str(c)) for c in columns]
+    for row in rows:
+        widths = [max(w, len(str(v))) for w, v in zip(widths, row)]
+
+    buf = 100 - len(title) - 2
+    print('\n' + '-'*(buf//2) + '[' + title + ']' + '-'*(buf - buf//2))
+    print('  '.join([str(c).rjust(w) for c, w in zip(columns, widths)]))
+    for row in rows:
+        print('  '.join([str(v).rjust(w) for v, w in zip(row, widths)]))
+    if not rows:
+        print('(none)')
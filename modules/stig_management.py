@@ -25,15 +25,25 @@ any attempt to download the 8% non-public files.
 # Import external libraries
 from modules import db_management
 from modules import system
+from modules import download_management
+from modules import report_management
 import os
+import re
+import csv
 import xml.etree.ElementTree as ET
+from lxml import etree
 import uuid
 import shutil
-from io import BytesIO
-from zipfile import ZipFile
-import requests # Comment this line out if using on an offline system
-from bs4 import BeautifulSoup # Comment this line out if using on an offline system
-import pandas as pd
+from io import BytesIO, StringIO
+from zipfile import ZipFile, BadZipFile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from itertools import islice
+from bs4 import BeautifulSoup, SoupStrainer # Comment this line out if using on an offline system
+try:
+    import lxml # Faster html parsing when installed
+    htmlParser = 'lxml'
+except ImportError:
+    htmlParser = 'html.parser'
 
 # Create STIG management menu
 class menu:
@@ -42,7 +52,12 @@ class menu:
 
         # Establish connection to sqlite db
         app.env = app.check_env('STIG Repository Path')
-        repo = stig_repo(app.env['STIG Repository Path'])
+        if app.env.get('Sort Conflict Policy') not in system.move_plan.policies:
+            if 'Sort Conflict Policy' in app.env:
+                print("\nSort Conflict Policy '" + str(app.env['Sort Conflict Policy']) + "' is not one of " + str(system.move_plan.policies) + ", using 'skip'.")
+            app.env['Sort Conflict Policy'] = 'skip'
+            app.write_env(app.env)
+        repo = stig_repo(app.env['STIG Repository Path'], app.env['Information System Name'])
 
         # Sub menu
         while True:
@@ -52,8 +67,17 @@ class menu:
                 1: 'Download STIG Content (Internet Required)',
                 2: 'Export STIG/SCAP Content',
                 3: 'Create STIG Checklist',
-                4: 'Sort STIG Repository',
-                5: 'Back',
+                4: 'Create STIG Checklists from Inventory',
+                5: 'Sort STIG Repository',
+                6: 'Sort STIG Repository (Dry Run)',
+                7: 'Undo Last Sort',
+                8: 'Deduplicate STIG Repository',
+                9: 'Import STIG Checklists',
+                10: 'Import CCI List',
+                11: 'NIST 800-53 Control Rollup',
+                12: 'Upgrade STIG Checklists',
+                13: 'Compare STIG Checklists',
+                14: 'Back',
             }
 
             # Display menu options
@@ -63,12 +87,13 @@ class menu:
             # Quit program
             if options[int(choice)] == 'Back':
                 repo.db.con.close()
+                repo.assets.con.close()
                 break
 
             # Download STIG content
             if options[int(choice)] == 'Download STIG Content (Internet Required)':
-                repo.check_available()
-                repo.download()
+                if repo.check_available():
+                    repo.download()
             
             # Export STIG content
             if options[int(choice)] == 'Export STIG/SCAP Content':
@@ -84,20 +109,87 @@ class menu:
                     print('\n' + selection)
                     repo.create_ckl(selection)
 
+            # Create checklists for every host of an inventory file
+            if options[int(choice)] == 'Create STIG Checklists from Inventory':
+                inventory = input("Enter the path of a CSV inventory (hostname, ip, mac, fqdn, role): ")
+                if not os.path.isfile(inventory):
+                    print("\n" + inventory + " does not exist.")
+                    continue
+                stigIds = []
+                while True:
+                    print("\nSelect a STIG to add, or None to continue.")
+                    selection = repo.db.select_content(benchmark=False)
+                    if not selection:
+                        break
+                    stigIds.append(selection)
+                if stigIds:
+                    repo.create_ckls(inventory, stigIds)
+
             # Sort files in the STIG repository
             if options[int(choice)] == 'Sort STIG Repository':
-                repo.sort()
+                repo.sort(policy = app.env['Sort Conflict Policy'])
                 repo.clean()
                 repo.report()
 
-# Create and manage the Information System's local DoD Cyber Exchange STIG and SCAP repository
-class stig_repo:
+            # Show what a sort would do without moving anything
+            if options[int(choice)] == 'Sort STIG Repository (Dry Run)':
+                repo.sort(policy = app.env['Sort Conflict Policy'], dryRun = True)
+
+            # Roll back the moves journaled by the last sort
+            if options[int(choice)] == 'Undo Last Sort':
+                repo.undo_sort()
+
+            # Report duplicate content and tally unique checklists only
+            if options[int(choice)] == 'Deduplicate STIG Repository':
+                groups = repo.dedup()
+                if groups and input("\nReplace duplicates with hardlinks (y/n)? ").lower() == 'y':
+                    print("Linked " + str(system.link_duplicates(groups)) + " duplicate(s)")
+                repo.report(unique = True)
 
-    def __init__(self, rootDir):
+            # Load checklist results from any directory into the system database
+            if options[int(choice)] == 'Import STIG Checklists':
+                directory = input("Enter the directory of checklists to import: ")
+                if not os.path.isdir(directory):
+                    print("\n" + directory + " does not exist.")
+                    continue
+                repo.import_ckls(directory)
+
+            # Load the DISA CCI list (U_CCI_List.xml or its zip)
+            if options[int(choice)] == 'Import CCI List':
+                fileName = input("Enter the path of the DISA CCI list (xml or zip): ")
+                if not os.path.isfile(fileName):
+                    print("\n" + fileName + " does not exist.")
+                    continue
+                repo.import_cci(fileName)
 
+            # Roll up checklist findings per control
+            if options[int(choice)] == 'NIST 800-53 Control Rollup':
+                revision = input("NIST SP 800-53 revision (leave empty for 4): ") or '4'
+                repo.rollup(revision)
 
+            # Move checklists to the latest downloaded STIG releases
+            if options[int(choice)] == 'Upgrade STIG Checklists':
+                repo.upgrade()
+
+            # Status changes between two checklists or two snapshots of a folder
+            if options[int(choice)] == 'Compare STIG Checklists':
+                old = input("Enter the previous checklist or directory: ")
+                new = input("Enter the current checklist or directory: ")
+                if not os.path.exists(old) or not os.path.exists(new):
+                    print("\nBoth paths must exist.")
+                    continue
+                try:
+                    repo.diff(old, new)
+                except ValueError as e:
+                    print("\n" + str(e))
+
+# Create and manage the Information System's local DoD Cyber Exchange STIG and SCAP repository
+class stig_repo:
+
+    def __init__(self, rootDir, systemName):
 
         self.db = db_management.stig()
+        self.assets = db_management.asset(systemName)
         self.rootDir = rootDir
         self.url = "https://public.cyber.mil/stigs/downloads/"
         self.fileStructure = {
@@ -134,7 +226,7 @@ class stig_repo:
             },
             'docs': {
                 'path': os.path.join(rootDir, 'documents'),
-                'authExt': ['csv', 'pdf', 'doc', 'docx', 'txt', 'xlsx'],
+                'authExt': ['csv', 'pdf', 'doc', 'docx', 'txt', 'xlsx', 'json'],
             },
             'archive': {
                 'path': os.path.join(rootDir, 'archive'),
@@ -146,11 +238,40 @@ class stig_repo:
             if not os.path.exists(self.fileStructure[dir]['path']):
                 os.mkdir(self.fileStructure[dir]['path'])
 
+        self.reindex()
+
+    # Add content stored before the search index existed to the index
+    def reindex(self):
+
+        untitled = self.db.untitled_content()
+        if not untitled:
+            return
+
+        print("\nIndexing " + str(len(untitled)) + " STIG(s) for search...")
+        for stigId, fileName, fileHash in untitled:
+            summary = xccdf_summary(BytesIO(self.db.fetch_blob(fileHash)))
+            summary['stigId'] = stigId
+            summary['fileName'] = fileName
+            self.db.update_titles(summary)
+        self.db.con.commit()
+        print("Complete!")
+
     # Check DoD Cyber Exchange for available downloads
+    # Returns False when the downloads page could not be read, nothing is cached or planned from an error page
     def check_available(self):
 
-        r = requests.get(self.url)
-        soup = BeautifulSoup(r.text, 'html.parser')
+        # Reuse the previous results if the page has not changed
+        cache = download_management.index_cache()
+        content, r = cache.fetch(self.url)
+        if content != None:
+            self.content = content
+            return True
+        if r.status_code != 200:
+            print("\n" + self.url + " returned HTTP " + str(r.status_code) + ", try again later.")
+            return False
+
+        # Only build the file rows of the page
+        soup = BeautifulSoup(r.content, htmlParser, parse_only = SoupStrainer('tr', attrs = {'class': 'file'}))
         content = {}
         for file in soup.find_all('tr',attrs={'class':'file'}):  
             try:
@@ -166,138 +287,417 @@ class stig_repo:
                     'date': file.find('div',attrs={'class':'av-post-date'}).text.strip(),
                 }
         
+        cache.save(self.url, r, content)
         self.content = content
 
+        return True
+
     # Build a SQLite inventory of cyber.mil contents for reference
-    def download(self):
-    
+    def download(self, workers = 8, processes = None):
+
         print("\nDownloading xccdf content from https://public.cyber.mil/stigs/downloads/...")
-        ptr = 0
-        data = []
-        for i in self.content:
+        plan = self.plan_sync()
+        print(
+            "Added: " + str(len(plan['added'])),
+            "Updated: " + str(len(plan['updated'])),
+            "Removed: " + str(len(plan['removed'])),
+            "Unchanged: " + str(len(plan['unchanged'])),
+            sep = "\n"
+        )
+        self.db.update_content(self.ingest(plan['added'] + plan['updated'], workers, processes))
+        print("\n[" + "="*46 + "COMPLETE" + "="*46 + "]")
 
-            # Update completion status
-            ptr = ptr + 1
-            print("[" + "="*(round((ptr/len(self.content))*100)) + " "*(100 - round((ptr/len(self.content))*100)) + "]", end = "\r")
+    # Compare available content against the local manifest before fetching anything
+    def plan_sync(self):
+
+        manifest = self.db.fetch_manifest()
+        plan = {
+            'added': [],
+            'updated': [],
+            'removed': [],
+            'unchanged': [],
+        }
+        for i in self.content:
 
             # Check if url provided for download
+            if not self.content[i]['href']:
+                continue
+
+            if i not in manifest:
+                plan['added'].append(i)
+            elif self.content[i]['date'] not in manifest[i]:
+                plan['updated'].append(i)
+            else:
+                plan['unchanged'].append(i)
+
+        # Content no longer listed online is kept locally for reference
+        plan['removed'] = [i for i in manifest if i not in self.content]
+
+        return plan
+
+    # Generate xccdf_content rows as archives are downloaded and parsed
+    def ingest(self, zipFolders, workers = 8, processes = None):
+
+        data = []
+        urls = {}
+        for i in zipFolders:
+
+            # Only zip archives can hold STIG/SCAP content
             url = self.content[i]['href']
-            if url:
+            if url.split(".")[-1].lower() == 'zip':
+                urls[i] = url
+            else:
+                data.append(empty_row(i, url, self.content[i]['date']))
+                data.append(synced_row(i, url, self.content[i]['date']))
+        yield from data
+        if not urls:
+            return
 
-                # Check if content needs updating
-                update = self.db.check_updates(i, self.content[i]['date'])
-                if update:
+        # Download archives concurrently, parsing each in a separate process as it arrives
+        engine = download_management.downloader(workers = workers)
+        with ProcessPoolExecutor(max_workers = processes) as pool:
+            pending = {}
+            for i, fileName in engine.fetch_all(urls):
 
-                    # Download and identify extension
-                    r = requests.get(url, allow_redirects=False)
-                    urlExt = url.split(".")[-1].lower()
-                    row = {}
-                    
-                    if urlExt == 'zip':
-                        zipData = ZipFile(BytesIO(r.content))
-                        stig_content = False
-                        for file in zipData.namelist():
-                            if file.split(".")[-1].lower() == 'xml':
-                                
-                                # Content wich can not be unzipped and parsed is assumed to not be STIG/SCAP content
-                                try:
-                                    xccdf = zipData.open(file).read().decode('utf-8')
-                                    root = ET.fromstring(xccdf)
-
-                                    # Determine if SCAP or STIG content
-                                    if 'manual' in file.lower():
-                                        fileType = 'manual'
-                                    elif 'benchmark' in file.lower():
-                                        fileType = 'benchmark'
-
-                                    row = {
-                                        'stigId': root.attrib['id'],
-                                        'fileName': file.split("/")[-1],
-                                        'zipFolder': i,
-                                        'href': url,
-                                        'date': self.content[i]['date'],
-                                        'fileType': fileType,
-                                        'fileContent': xccdf,
-                                    }
-                                    data.append(row)
-                                    stig_content = True
-                                except:
-                                    None
-                        
-                        # Create entry to remember non-STIG/SCAP content
-                        if stig_content == False:
-                            row = {
-                                'stigId': None,
-                                'fileName': None,
-                                'zipFolder': i,
-                                'href': url,
-                                'date': self.content[i]['date'],
-                                'fileType': None,
-                                'fileContent': None,
-                            }
-                            data.append(row)
+                # Failed downloads are left out so they are retried on the next sync
+                if fileName == None:
+                    continue
+                pending[pool.submit(scan_zip, fileName)] = (i, fileName)
 
-                    else:
-                        row = {
-                            'stigId': None,
-                            'fileName': None,
-                            'zipFolder': i,
-                            'href': url,
-                            'date': self.content[i]['date'],
-                            'fileType': None,
-                            'fileContent': None,
-                        }
-                        data.append(row)
-
-        self.db.update_content(data)
-        print("[" + "="*46 + "COMPLETE" + "="*46 + "]")
+                # Store archives which finished parsing while downloads continue
+                for future in [f for f in pending if f.done()]:
+                    i, fileName = pending.pop(future)
+                    yield from self.archive_rows(i, fileName, future.result())
+
+            # Gather the remaining parse results
+            for future in as_completed(pending):
+                i, fileName = pending[future]
+                yield from self.archive_rows(i, fileName, future.result())
+
+        engine.close()
+        engine.report()
+
+    # Generate rows for the xccdf members of a downloaded archive
+    def archive_rows(self, zipFolder, fileName, members):
+
+        url = self.content[zipFolder]['href']
+        date = self.content[zipFolder]['date']
+
+        # An unreadable archive is a failed download, without a row it is fetched again on the next sync
+        if members == None:
+            os.remove(fileName)
+            print("\n" + zipFolder + " is not a readable zip archive and will be retried on the next sync")
+            return
+
+        if members:
+            with ZipFile(fileName) as zipData:
+                for m in members:
+
+                    # Raw bytes are passed to the blob store without decoding or building a tree
+                    yield {
+                        'stigId': m['stigId'],
+                        'fileName': m['fileName'],
+                        'zipFolder': zipFolder,
+                        'href': url,
+                        'date': date,
+                        'fileType': m['fileType'],
+                        'fileContent': zipData.read(m['member']),
+                        'title': m['title'],
+                        'ruleTitles': m['ruleTitles'],
+                    }
+
+        # Create entry to remember non-STIG/SCAP content
+        else:
+            yield empty_row(zipFolder, url, date)
+        yield synced_row(zipFolder, url, date)
+        os.remove(fileName)
 
     # Export xccdf content
     def export_xccdf(self, stigId):
 
-        content = self.db.fetch_content(columns = ['fileName', 'fileContent'], conditions = {'stigId': stigId})
+        content = self.db.fetch_content(columns = ['fileName', 'fileHash'], conditions = {'stigId': stigId}).fetchone()
 
         # Save file to exports
-        if 'benchmark' in content[0][0].lower():
-            fileName = os.path.join(self.fileStructure['benchmark']['path'], content[0][0])
+        if 'benchmark' in content['fileName'].lower():
+            fileName = os.path.join(self.fileStructure['benchmark']['path'], content['fileName'])
         else:
-            fileName = os.path.join(self.fileStructure['manual']['path'], content[0][0])
+            fileName = os.path.join(self.fileStructure['manual']['path'], content['fileName'])
         with open(fileName, 'wb') as f:
-            f.write(content[0][1].encode('utf-8'))
+            f.write(self.db.fetch_blob(content['fileHash']))
         print("\nSaved content to " + fileName)
 
+    # Parsed xccdf dictionary of a STIG, parsing only if no cached model exists
+    def load_xccdf(self, stigId):
+
+        content = self.db.fetch_content(columns = ['fileName', 'fileHash'], conditions = {'stigId': stigId}).fetchone()
+        xccdf_dict = self.db.fetch_model(stigId, content['fileHash'])
+        if xccdf_dict == None:
+            xccdf_dict = parse_xccdf(content['fileName'], self.db.fetch_blob(content['fileHash']))
+            self.db.store_model(stigId, content['fileHash'], xccdf_dict)
+
+        return xccdf_dict
+
     # Create STIG checklist
     def create_ckl(self, stigId):
 
-        # Fetch content from database
-        content = self.db.fetch_content(columns = ['fileName', 'fileContent'], conditions = {'stigId': stigId})
+        # Fetch parsed content from database
+        xccdf_dict = self.load_xccdf(stigId)
+        host_data = default_host_data()
 
-        # Parse xccdf into dictionary, then convert to checklist
-        xccdf_dict = parse_xccdf(content[0][0], content[0][1])
-        ckl = generate_ckl(xccdf_dict)
+        # Save file to exports, named from the parsed content
+        fileName = os.path.join(self.fileStructure['wip']['path'], name_xccdf_ckl(xccdf_dict, host_data))
+        with open(fileName, 'w', encoding = 'UTF-8', newline = '') as f:
+            write_ckl(xccdf_dict, f, host_data)
+        print("\nSaved content to " + fileName)
 
-        # Parse ckl to get filename
-        ckl_dict = parse_ckl(ckl)
+    # Create checklists of several STIGs for every host of an inventory
+    def create_ckls(self, inventory, stigIds, workers = None):
 
-        # Save file to exports
-        fileName = os.path.join(self.fileStructure['wip']['path'], name_ckl(ckl_dict))
-        with open(fileName, 'wb') as f:
-            f.write(ckl.encode('UTF-8'))
-        print("\nSaved content to " + fileName)
+        hosts, rejected = unique_hosts(read_inventory(inventory))
+        if rejected:
+            print("\nSkipped " + str(len(rejected)) + " inventory row(s) that would be saved under the same checklist name:")
+            for n, host_data in rejected:
+                print("  row " + str(n) + ": " + str(host_data['HOST_NAME'] or '(no host name)'))
+        outDir = self.fileStructure['wip']['path']
+        workers = workers or os.cpu_count() or 1
+
+        # Each benchmark is parsed once and rendered for chunks of hosts in parallel
+        saved = []
+        with ProcessPoolExecutor(max_workers = workers) as pool:
+            futures = []
+            for stigId in stigIds:
+                xccdf_dict = self.load_xccdf(stigId)
+                size = max(1, -(-len(hosts)//(workers*4)))
+                for n in range(0, len(hosts), size):
+                    futures.append(pool.submit(render_ckls, xccdf_dict, hosts[n:n + size], outDir))
+
+            ptr = 0
+            for future in as_completed(futures):
+
+                # Update completion status
+                ptr = ptr + 1
+                print("[" + "="*(round((ptr/len(futures))*100)) + " "*(100 - round((ptr/len(futures))*100)) + "]", end = "\r")
+                saved.extend(future.result())
+
+        print("[" + "="*46 + "COMPLETE" + "="*46 + "]")
+        print("\nSaved " + str(len(saved)) + " checklist(s) to " + outDir)
+
+        return saved
+
+    # Upgrade wip and final checklists to the STIG releases in stig.db, archiving the checklists replaced
+    def upgrade(self, workers = None):
+
+        # Checklists to upgrade grouped by STIG, each benchmark is loaded once from the model cache
+        self.update_index(workers)
+        paths = {}
+        for row in self.assets.fetch_ckls():
+            if not row['stig_id']:
+                continue
+            for s in ['wip', 'final']:
+                if row['file_path'].startswith(os.path.join(self.fileStructure[s]['path'], '')):
+                    paths.setdefault(row['stig_id'], []).append(row['file_path'])
+        available = [r['stigId'] for r in self.db.fetch_content(columns = ['stigId'], conditions = {'stigId': sorted(paths)})] if paths else []
+
+        upgraded = []
+        skipped = []
+        workers = workers or os.cpu_count() or 1
+        with ProcessPoolExecutor(max_workers = workers) as pool:
+            futures = []
+            for stigId in available:
+                xccdf_dict = self.load_xccdf(stigId)
+
+                # Group checklists by the name of their upgrade before writing anything
+                # A name already on disk or shared by several checklists is left for the user to resolve
+                targets = {}
+                for fPath in sorted(paths[stigId]):
+                    asset, info = ckl_header(fPath)
+                    if info.get('version') == xccdf_dict['version'] and info.get('releaseinfo') == xccdf_dict['release-info']:
+                        continue
+                    fileName = os.path.join(os.path.dirname(fPath), name_xccdf_ckl(xccdf_dict, asset))
+                    targets.setdefault(fileName.lower(), (fileName, []))[1].append(fPath)
+                stigPaths = []
+                for key in sorted(targets):
+                    fileName, sources = targets[key]
+                    if len(sources) > 1 or os.path.exists(fileName):
+                        skipped.extend(sources)
+                    else:
+                        stigPaths.extend(sources)
+                if not stigPaths:
+                    continue
+                size = max(1, -(-len(stigPaths)//(workers*4)))
+                for n in range(0, len(stigPaths), size):
+                    futures.append(pool.submit(upgrade_ckls, xccdf_dict, stigPaths[n:n + size]))
+
+            ptr = 0
+            for future in as_completed(futures):
+
+                # Update completion status
+                ptr = ptr + 1
+                print("[" + "="*(round((ptr/len(futures))*100)) + " "*(100 - round((ptr/len(futures))*100)) + "]", end = "\r")
+                upgraded.extend(future.result())
+
+        # Superseded checklists go to the archive through a move plan journaled apart from sort, Undo Last Sort leaves them alone
+        plan = system.move_plan('version', os.path.join('data', 'upgrade_journal.jsonl'))
+        for fPath, fileName, matched in upgraded:
+            plan.add(fPath, os.path.join(self.fileStructure['archive']['path'], os.path.basename(fPath)))
+        plan.resolve()
+        for fPath, destination in plan.apply():
+            self.assets.move_ckl(fPath, destination)
+        self.assets.con.commit()
+
+        print("\nUpgraded " + str(len(upgraded)) + " checklist(s), carried over " + str(sum([u[2] for u in upgraded])) + " answer(s)")
+        if skipped:
+            print("\nSkipped " + str(len(skipped)) + " checklist(s) whose upgrade already exists or would be shared with another checklist:")
+            for fPath in sorted(skipped):
+                print("  " + fPath)
+
+        return upgraded
+
+    # Compare two checklists, or two directories of checklists paired by host and stigid
+    def diff(self, old, new, workers = None, formats = ('json', 'csv')):
+
+        # Two files are compared directly, directories are paired from their checklist headers
+        checklists = []
+        if os.path.isfile(old) and os.path.isfile(new):
+            pairs = [(old, new)]
+        elif os.path.isdir(old) and os.path.isdir(new):
+            keys = {}
+            for side, directory in [('old', old), ('new', new)]:
+                paths = sorted([f[0] for f in scan_files(directory) if f[0].split('.')[-1].lower() == 'ckl'])
+                keys[side] = {}
+                for fPath, key in map(ckl_key, paths):
+                    keys[side].setdefault(key, []).append(fPath)
+
+            # A host and stigid shared by several checklists on either side cannot be paired, every one of them is reported
+            duplicates = set([k for side in keys for k in keys[side] if len(keys[side][k]) > 1])
+            for k in sorted(duplicates, key = str):
+                checklists = checklists + [k + ('duplicate', fPath, None) for fPath in keys['old'].get(k, [])]
+                checklists = checklists + [k + ('duplicate', None, fPath) for fPath in keys['new'].get(k, [])]
+            for side in keys:
+                keys[side] = dict((k, keys[side][k][0]) for k in keys[side] if k not in duplicates)
+
+            pairs = [(keys['old'][k], keys['new'][k]) for k in sorted(keys['old'].keys() & keys['new'].keys(), key = str)]
+            checklists = checklists + [k + ('removed', keys['old'][k], None) for k in sorted(keys['old'].keys() - keys['new'].keys(), key = str)]
+            checklists = checklists + [k + ('new', None, keys['new'][k]) for k in sorted(keys['new'].keys() - keys['old'].keys(), key = str)]
+        else:
+            raise ValueError("Compare two checklists or two directories of checklists, " + old + " and " + new + " are not the same kind")
+
+        # Diff every pair in worker processes, only the changes come back
+        changes = []
+        if len(pairs) > 1 and workers != 1:
+            workers = workers or os.cpu_count() or 1
+            with ProcessPoolExecutor(max_workers = workers) as pool:
+                for result in pool.map(diff_ckl, pairs, chunksize = max(1, len(pairs)//(workers*4))):
+                    changes.extend(result)
+        else:
+            for pair in pairs:
+                changes.extend(diff_ckl(pair))
+
+        tables = {
+            'Changes': (['Host', 'STIG_ID', 'Vuln_Num', 'Rule_ID', 'Severity', 'Change', 'Old_Status', 'New_Status'], changes),
+            'Checklists': (['Host', 'STIG_ID', 'Change', 'Old', 'New'], checklists),
+        }
+        totals = {}
+        for row in changes:
+            totals[row[5]] = totals.get(row[5], 0) + 1
+        print(
+            "\nCompared " + str(len(pairs)) + " checklist pair(s)",
+            *[c.ljust(11) + str(totals.get(c, 0)) for c in ['transition', 'new', 'removed']],
+            "Unpaired   " + str(len([c for c in checklists if c[2] != 'duplicate'])),
+            "Duplicate  " + str(len([c for c in checklists if c[2] == 'duplicate'])),
+            sep = "\n"
+        )
+
+        fPath = os.path.join(self.fileStructure['docs']['path'], 'STIG_CKL_Diff')
+        saved = report_management.write_report(tables, fPath, formats)
+        print("\nSaved differences to " + ", ".join(saved))
+
+        return tables
+
+    # Bring the checklist index up to date, scanning only new or changed checklists in parallel
+    # Checklists below directory, the repository by default, are imported in chunked transactions
+    def update_index(self, workers = None, files = None, directory = None, chunkSize = 200):
+
+        directory = directory or self.rootDir
+        known = self.assets.fetch_index(directory)
+        found = set()
+        changed = []
+        for fPath, size, mtime in files if files != None else scan_files(directory):
+            fName = os.path.basename(fPath)
+            if fName[0] == '.' or fPath.split('.')[-1].lower() != 'ckl':
+                continue
+            found.add(fPath)
+
+            # Unchanged size and mtime means the indexed summary is current
+            if fPath in known and known[fPath][0] == size and known[fPath][1] == mtime:
+                continue
+            changed.append((fPath, size, mtime, known[fPath][2] if fPath in known else None))
+
+        # Hash and summarize changed checklists in worker processes, importing results as they arrive
+        pool = None
+        if len(changed) > 1 and workers != 1:
+            workers = workers or os.cpu_count() or 1
+            pool = ProcessPoolExecutor(max_workers = workers)
+            rows = pool.map(summarize_ckl, changed, chunksize = max(1, min(chunkSize, len(changed)//(workers*4))))
+        else:
+            rows = map(summarize_ckl, changed)
 
-    # Sort files in the STIG repository
-    def sort(self):
-        
-        # Determine contents of all folders and iterate through
-        files = index_files(self.rootDir)
         ptr = 0
-        for fPath in files:
-            
-            # Update completion status
-            ptr = ptr + 1
-            print("[" + "="*(round((ptr/len(files))*100)) + " "*(100 - round((ptr/len(files))*100)) + "]", end = "\r")
+        skipped = []
+        try:
+            while True:
+                chunk = list(islice(rows, chunkSize))
+                if not chunk:
+                    break
+
+                # Touched but identical content only needs new metadata
+                for row in chunk:
+                    if 'error' in row:
+                        skipped.append(row)
+                    elif 'stig_id' not in row:
+                        self.assets.touch_ckl(row['file_path'], row['size'], row['mtime'])
+                self.assets.import_ckl([row for row in chunk if 'stig_id' in row])
+
+                # Update completion status
+                ptr = ptr + len(chunk)
+                if len(changed) > chunkSize:
+                    print("[" + "="*(round((ptr/len(changed))*100)) + " "*(100 - round((ptr/len(changed))*100)) + "]", end = "\r")
+        finally:
+            if pool:
+                pool.shutdown()
+
+        # Unreadable checklists leave the index until they can be parsed again
+        unreadable = set([row['file_path'] for row in skipped])
+        self.assets.remove_ckls([p for p in known if p not in found or p in unreadable])
+        if skipped:
+            print("\nSkipped " + str(len(skipped)) + " unreadable checklist(s):")
+            for row in skipped:
+                print("  " + row['file_path'] + " (" + row['error'] + ")")
+
+        return len(changed) - len(skipped)
 
-            fName = fPath.split("\\")[-1]
+    # Import every checklist below a directory into the system database
+    def import_ckls(self, directory, workers = None):
+
+        imported = self.update_index(workers, directory = directory)
+        self.assets.add_import(directory)
+        print("\nImported " + str(imported) + " new or changed checklist(s) from " + directory)
+
+        return imported
+
+    # Sort files in the STIG repository
+    def sort(self, workers = None, policy = 'skip', dryRun = False):
+
+        # Discover every file once, checklist summaries come from the index
+        files = list(scan_files(self.rootDir))
+        self.update_index(workers, files)
+        summaries = {row['file_path']: row for row in self.assets.fetch_ckls()}
+
+        # Plan every move before changing anything
+        plan = system.move_plan(policy)
+        for fPath, size, mtime in files:
+
+            fName = os.path.basename(fPath)
             ext = fPath.split('.')[-1].lower()
             
             # Ignore any files starting with '.'
@@ -306,20 +706,24 @@ class stig_repo:
             
             # Handle ckl based on completion status
             if ext == 'ckl':
-                
-                # Parse checklist
-                with open(fPath, 'rb') as c:
-                    ckl = c.read()
-                ckl_dict = parse_ckl(ckl)
+
+                # Unreadable checklists were reported by update_index and stay where they are
+                if fPath not in summaries:
+                    continue
+
+                # Checklists superseded by an upgrade stay archived
+                if fPath.startswith(os.path.join(self.fileStructure['archive']['path'], '')):
+                    continue
                 
                 # Determine destination based on remaining Not_Reviewed
-                if ckl_dict['summary']['Not_Reviewed'] == 0:
+                if summaries[fPath]['not_reviewed'] == 0:
                     destination = os.path.join(self.fileStructure['final']['path'], fName)
                 else:
                     destination = os.path.join(self.fileStructure['wip']['path'], fName)
             
             # Handle xccdf content based on name
             elif ext == 'xml':
+                destination = fPath
                 for s in self.fileStructure:
                     if s in fName.lower():
                         destination = os.path.join(self.fileStructure[s]['path'], fName)
@@ -330,11 +734,74 @@ class stig_repo:
                     destination = os.path.join(self.fileStructure['docs']['path'], fName)
                 else:
                     destination = os.path.join(self.fileStructure['archive']['path'], fName)
-            
-            # Move files
-            system.move_file(fPath, destination)
-            
-        print("[" + "="*46 + "COMPLETE" + "="*46 + "]")
+
+            plan.add(fPath, destination)
+
+        # Resolve conflicts in a deterministic order, then report or apply
+        plan.resolve()
+        if dryRun:
+            plan.report()
+            return plan
+
+        for fPath, destination in plan.apply():
+            if fPath.split('.')[-1].lower() == 'ckl':
+                self.assets.move_ckl(fPath, destination)
+        self.assets.con.commit()
+
+        return plan
+
+    # Put back every file moved by the last sort
+    def undo_sort(self):
+
+        restored = system.rollback_moves()
+        for src, des in restored:
+            if src.split('.')[-1].lower() == 'ckl':
+                self.assets.move_ckl(src, des)
+        self.assets.con.commit()
+        print("\nRestored " + str(len(restored)) + " file(s)")
+
+    # Find files with identical content, optionally replacing the copies with hardlinks
+    def dedup(self, link = False):
+
+        groups, wasted = system.find_duplicates(scan_files(self.rootDir))
+        for group in groups:
+            print(group[0], *["  = " + path for path in group[1:]], sep = "\n")
+        print("\nFound " + str(sum([len(g) - 1 for g in groups])) + " duplicate(s) in " + str(len(groups)) + " group(s), " + str(round(wasted/1024/1024, 2)) + " MB")
+
+        if link and groups:
+            print("Linked " + str(system.link_duplicates(groups)) + " duplicate(s)")
+
+        return groups
+
+    # Load the DISA CCI list into stig.db
+    def import_cci(self, fileName):
+
+        count = self.db.import_cci(iter_cci_list(fileName))
+        print("\nImported " + str(count) + " CCI(s) from " + fileName)
+
+        return count
+
+    # Roll up checklist findings per NIST SP 800-53 control
+    # Sorted checklists and imported directories count, archived and unsorted checklists do not
+    def rollup(self, revision = '4', formats = ('csv', 'json')):
+
+        self.update_index()
+        directories = [self.fileStructure['wip']['path'], self.fileStructure['final']['path']] + self.assets.fetch_imports()
+        tables = {
+            'Controls': (
+                ['Control', 'Hosts', 'Findings', 'Open', 'Not_Reviewed', 'NotAFinding', 'Not_Applicable', 'Status'],
+                self.assets.rollup_controls(self.db.name, revision, directories),
+            ),
+        }
+        if not tables['Controls'][1]:
+            print("\nNo findings map to NIST SP 800-53 revision " + revision + " controls, import the CCI list first.")
+            return tables
+
+        fPath = os.path.join(self.fileStructure['docs']['path'], 'NIST_800-53_Rollup')
+        saved = report_management.write_report(tables, fPath, formats)
+        print("\nRolled up " + str(len(tables['Controls'][1])) + " control(s), saved to " + ", ".join(saved))
+
+        return tables
 
     # Remove empty directories from STIG repository
     def clean(self):
@@ -352,13 +819,39 @@ class stig_repo:
                     os.rmdir(path)
 
     # Create summary report of checklist contents
-    def report(self):
+    def report(self, unique = False, formats = ('xlsx', 'csv', 'json'), legacy = False):
 
-        # Tally up results
-        wip_ckls = index_files(self.fileStructure['wip']['path'])
-        wip = tally_ckl(wip_ckls)
-        final_ckls = index_files(self.fileStructure['final']['path'])
-        final = tally_ckl(final_ckls)
+        # Tally up results from the checklist index, optionally counting identical checklists once
+        self.update_index()
+        if legacy:
+            return self.legacy_report(unique)
+
+        sorted_ckls = [self.fileStructure['wip']['path'], self.fileStructure['final']['path']]
+        counts = ['Checklists', 'Not_Reviewed', 'Open', 'NotAFinding', 'Not_Applicable', 'Missing_Details', 'Missing_Comments']
+        statuses = ['Not_Reviewed', 'Open', 'NotAFinding', 'Not_Applicable']
+        tables = {
+            'Final': (['STIG_ID', 'Count'], list(self.assets.tally_ckls(self.fileStructure['final']['path'], unique).items())),
+            'WIP': (['STIG_ID', 'Count'], list(self.assets.tally_ckls(self.fileStructure['wip']['path'], unique).items())),
+            'Hosts': (['Host'] + counts, self.assets.summarize_ckls('hostname', sorted_ckls, unique)),
+            'STIGs': (['STIG_ID'] + counts, self.assets.summarize_ckls('stig_id', sorted_ckls, unique)),
+            'Status': (['Status'] + counts, self.assets.summarize_ckls('status', sorted_ckls, unique)),
+            'Severity': (['Severity'] + statuses, self.assets.summarize_severity(sorted_ckls, unique)),
+        }
+        for name in ['Final', 'WIP', 'Severity']:
+            report_management.print_table(name.upper(), *tables[name])
+
+        fPath = os.path.join(self.fileStructure['docs']['path'], 'STIG_CKL_Summary')
+        saved = report_management.write_report(tables, fPath, formats)
+        print("\nSaved summary report to " + ", ".join(saved))
+
+        return tables
+
+    # Original pandas report of checklist counts per STIG
+    def legacy_report(self, unique = False):
+
+        import pandas as pd
+        wip = self.assets.tally_ckls(self.fileStructure['wip']['path'], unique)
+        final = self.assets.tally_ckls(self.fileStructure['final']['path'], unique)
 
         # Convert to excel
         wip_df = pd.DataFrame(wip.items(), columns=['STIG_ID', 'Count'])
@@ -375,197 +868,476 @@ class stig_repo:
 
         print("\nSaved summary report to " + fPath)
             
-# Tally checklists
-def tally_ckl(ckl_list):
-
-    tally = {}
-    for fpath in ckl_list:
-        with open(fpath, 'rb') as f:
-            ckl = f.read()
-        ckl_dict = parse_ckl(ckl)
-        
-        # Handle key already generated
-        if ckl_dict['STIG_INFO']['stigid'] in tally:
-            tally[ckl_dict['STIG_INFO']['stigid']] += 1
+# Inventory columns and the checklist ASSET element they fill
+inventoryColumns = {
+    'HOSTNAME': 'HOST_NAME',
+    'IP': 'HOST_IP',
+    'MAC': 'HOST_MAC',
+    'FQDN': 'HOST_FQDN',
+    'ROLE': 'ROLE',
+}
+
+# Read host data from a CSV inventory, columns may also be named after ASSET elements
+def read_inventory(fileName):
+
+    hosts = []
+    with open(fileName, 'r', encoding = 'utf-8-sig', newline = '') as f:
+        for row in csv.DictReader(f):
+            host_data = default_host_data()
+            for col in row:
+                key = str(col).strip().upper().replace(' ', '_')
+                key = inventoryColumns.get(key, key)
+                if key in host_data and row[col]:
+                    host_data[key] = row[col].strip()
+            hosts.append(host_data)
+
+    return hosts
+
+# Split inventory hosts into those with a unique checklist name and the (row, host_data) of those without
+# Names only differ by marking and host name, compared without case for case-insensitive file systems
+def unique_hosts(hosts):
+
+    names = {}
+    for host_data in hosts:
+        key = (str(host_data['MARKING']) + '_' + str(host_data['HOST_NAME'] or 'Template')).lower()
+        names[key] = names.get(key, 0) + 1
+
+    unique = []
+    rejected = []
+    for n, host_data in enumerate(hosts):
+        key = (str(host_data['MARKING']) + '_' + str(host_data['HOST_NAME'] or 'Template')).lower()
+        if names[key] == 1:
+            unique.append(host_data)
         else:
-            tally[ckl_dict['STIG_INFO']['stigid']] = 1
-    
-    return tally
+            rejected.append((n + 2, host_data))
+
+    return unique, rejected
+
+# Write a checklist for each host, run in a worker process
+def render_ckls(xccdf_dict, hosts, outDir):
+
+    saved = []
+    for host_data in hosts:
+        fileName = os.path.join(outDir, name_xccdf_ckl(xccdf_dict, host_data))
+        with open(fileName, 'w', encoding = 'UTF-8', newline = '') as f:
+            write_ckl(xccdf_dict, f, host_data)
+        saved.append(fileName)
+
+    return saved
+
+# Hash a changed checklist and scan it only if its content changed, run in a worker process
+def summarize_ckl(changed):
 
-## FUNCTION: FIND BETWEEN TWO POINTS IN A STRING
-## NEEDED DUE TO XML TAGS BEING CONTAINED WITHIN DESCRIPTION TEXT
-def find_between( s, first, last ):
+    fPath, size, mtime, knownHash = changed
     try:
-        start = s.index( first ) + len( first )
-        end = s.index( last, start )
-        return s[start:end]
-    except ValueError:
-        return ""
-# Credit for the find_between function goes to pkeech at https://github.com/pkeech/stig_parser
+        fileHash = system.file_hash(fPath)
+        if fileHash == knownHash:
+            return {'file_path': fPath, 'size': size, 'mtime': mtime}
 
+        return ckl_row(fPath, size, mtime, fileHash, scan_ckl(fPath, vulns = True))
 
-# Parse all components of xccdf into a dictionary file
-def parse_xccdf(filename, raw):
-    
-    # Prep for building dictionary
-    root = ET.fromstring(raw)
-    nameSpace = {
-        'xmlns': '{http://checklists.nist.gov/xccdf/1.1}',
-        'dc': '{http://purl.org/dc/elements/1.1/}',
-        'xhtml': '{http://www.w3.org/XML/1998/namespace}'
+    # A malformed checklist is reported instead of stopping the import
+    except (ET.ParseError, etree.XMLSyntaxError, KeyError, AttributeError, OSError) as e:
+        return {'file_path': fPath, 'error': type(e).__name__ + ": " + str(e)}
+
+# Checklist index row from a scanned checklist
+def ckl_row(fPath, size, mtime, fileHash, ckl_dict):
+
+    row = {
+        'file_path': fPath,
+        'size': size,
+        'mtime': mtime,
+        'hash': fileHash,
+        'hostname': ckl_dict['ASSET'].get('HOST_NAME'),
+        'fqdn': ckl_dict['ASSET'].get('HOST_FQDN'),
+        'ip': ckl_dict['ASSET'].get('HOST_IP'),
+        'stig_id': ckl_dict['STIG_INFO'].get('stigid'),
+        'status': 'final' if ckl_dict['summary']['Not_Reviewed'] == 0 else 'wip',
+        'not_reviewed': ckl_dict['summary']['Not_Reviewed'],
+        'not_a_finding': ckl_dict['summary']['NotAFinding'],
+        'not_applicable': ckl_dict['summary']['Not_Applicable'],
+        'open': ckl_dict['summary']['Open'],
+        'missing_details': ckl_dict['summary']['Missing_Details'],
+        'missing_comments': ckl_dict['summary']['Missing_Comments'],
+        'severity': ckl_dict['severity'],
+        'asset': ckl_dict['ASSET'],
+        'vulns': ckl_dict.get('VULN', []),
     }
-    
-    # Handle non-standard elements
-    try:
-        description = root.find(nameSpace['xmlns'] + 'description').text
-    except AttributeError:
-        description = None
-    try:
-        generator = root.find(".//*[@id='generator']").text
-    except AttributeError:
-        generator = None
+
+    return row
+
+# Entry remembering content that is not STIG/SCAP xccdf
+def empty_row(zipFolder, href, date):
+
+    row = {
+        'stigId': None,
+        'fileName': None,
+        'zipFolder': zipFolder,
+        'href': href,
+        'date': date,
+        'fileType': None,
+        'fileContent': None,
+    }
+
+    return row
+
+# Marker telling the database writer an archive is completely stored
+def synced_row(zipFolder, href, date):
+
+    row = {
+        'synced': True,
+        'zipFolder': zipFolder,
+        'href': href,
+        'date': date,
+    }
+
+    return row
+
+# Classify the xml members of a downloaded archive, run in a worker process
+# Returns None when the file is not a readable zip
+def scan_zip(fileName):
+
+    members = []
     try:
-        conventionsVersion = root.find(".//*[@id='conventionsVersion']").text
-    except AttributeError:
-        conventionsVersion = None
-    
-    # Add static data
+        with ZipFile(fileName) as zipData:
+            for file in zipData.namelist():
+                if file.split(".")[-1].lower() == 'xml':
+
+                    # Content wich can not be unzipped and parsed is assumed to not be STIG/SCAP content
+                    try:
+                        with zipData.open(file) as member:
+                            summary = xccdf_summary(member)
+                    except:
+                        continue
+
+                    # Determine if SCAP or STIG content
+                    if 'manual' in file.lower():
+                        fileType = 'manual'
+                    elif 'benchmark' in file.lower():
+                        fileType = 'benchmark'
+                    else:
+                        continue
+
+                    members.append({
+                        'member': file,
+                        'stigId': summary['stigId'],
+                        'fileName': file.split("/")[-1],
+                        'fileType': fileType,
+                        'title': summary['title'],
+                        'ruleTitles': summary['ruleTitles'],
+                    })
+    # Truncated downloads and error pages are not archives at all
+    except (BadZipFile, OSError, EOFError):
+        return None
+
+    return members
+
+# Read the id, title and rule titles of an xccdf stream for the search index
+def xccdf_summary(stream):
+
+    summary = {
+        'stigId': None,
+        'title': None,
+        'ruleTitles': [],
+    }
+    path = []
+    for event, elem in ET.iterparse(stream, events = ('start', 'end')):
+        tag = elem.tag.split('}')[-1]
+        if event == 'start':
+            if not path:
+                root = elem
+                summary['stigId'] = elem.attrib['id']
+            path.append(tag)
+            continue
+
+        path.pop()
+        if tag == 'title' and len(path) == 1:
+            summary['title'] = elem.text
+        elif tag == 'title' and path[-1] == 'Rule' and elem.text:
+            summary['ruleTitles'].append(elem.text)
+
+        # Discard each top level element once processed
+        if len(path) == 1:
+            root.clear()
+    summary['ruleTitles'] = '\n'.join(summary['ruleTitles'])
+
+    return summary
+
+# Pseudo-xml fields embedded in the description of each rule
+descriptionFields = [
+    'VulnDiscussion',
+    'FalsePositives',
+    'FalseNegatives',
+    'Documentable',
+    'Mitigations',
+    'SeverityOverrideGuidance',
+    'PotentialImpacts',
+    'ThirdPartyTools',
+    'MitigationControl',
+    'Responsibility',
+    'IAControls',
+]
+descriptionTags = re.compile('<(' + '|'.join(descriptionFields) + ')>')
+
+# Split a rule description into its fields in a single scan, text between an opening tag and its closing tag
+# Field layout follows find_between by pkeech at https://github.com/pkeech/stig_parser
+def parse_description(description):
+
+    fields = dict.fromkeys(descriptionFields, "")
+    if description == None:
+        return fields
+
+    # First opening tag of each field, closed by the next matching closing tag
+    found = set()
+    for m in descriptionTags.finditer(description):
+        tag = m.group(1)
+        if tag in found:
+            continue
+        found.add(tag)
+        end = description.find('</' + tag + '>', m.end())
+        if end != -1:
+            fields[tag] = description[m.end():end]
+        if len(found) == len(descriptionFields):
+            break
+
+    return fields
+
+# Parse all components of xccdf into a dictionary file
+def parse_xccdf(filename, raw):
+
+    # Materialize every group of the streaming parser
+    xccdf_dict = iter_xccdf(filename, raw)
+    xccdf_dict['group'] = dict(xccdf_dict['group'])
+
+    return xccdf_dict
+
+# XCCDF namespaces
+nameSpace = {
+    'xmlns': '{http://checklists.nist.gov/xccdf/1.1}',
+    'dc': '{http://purl.org/dc/elements/1.1/}',
+    'xhtml': '{http://www.w3.org/XML/1998/namespace}'
+}
+
+# Stream xccdf into a dictionary whose 'group' is a generator of (vulnId, group) pairs
+def iter_xccdf(filename, raw):
+
+    # Accept raw bytes, legacy text or a file object
+    if isinstance(raw, str):
+        raw = raw.encode('utf-8')
+    if isinstance(raw, bytes):
+        raw = BytesIO(raw)
+    events = ET.iterparse(raw, events = ('start', 'end'))
+
     xccdf_dict = {
         'filename': filename,
-        'benchmark': {
-            'id': root.attrib['id'],
-            'lang': root.attrib[nameSpace['xhtml'] + 'lang'],
-        },
-        'status': {
-            'date': root.find(nameSpace['xmlns'] + 'status').attrib['date'],
-            'result': root.find(nameSpace['xmlns'] + 'status').text,
-        },
-        'title': root.find(nameSpace['xmlns'] + 'title').text,
-        'description': description,
-        'reference': {
-            'publisher': root.find(nameSpace['xmlns'] + 'reference').find(nameSpace['dc'] + 'publisher').text,
-            'source': root.find(nameSpace['xmlns'] + 'reference').find(nameSpace['dc'] + 'source').text,
-        },
-        'release-info': root.find(".//*[@id='release-info']").text,
-        'generator': generator,
-        'conventionsVersion': conventionsVersion,
-        'version': root.find(nameSpace['xmlns'] + 'version').text,
-        'group': {}
+        'benchmark': {},
+        'status': None,
+        'title': None,
+        'description': None,
+        'reference': None,
+        'release-info': None,
+        'generator': None,
+        'conventionsVersion': None,
+        'version': None,
+        'group': iter(()),
     }
-    
+
+    # Read everything ahead of the first group
+    depth = 0
+    for event, elem in events:
+        if event == 'start':
+            depth = depth + 1
+            if depth == 1:
+                root = elem
+                xccdf_dict['benchmark'] = {
+                    'id': elem.attrib['id'],
+                    'lang': elem.attrib[nameSpace['xhtml'] + 'lang'],
+                }
+            elif depth == 2 and elem.tag == nameSpace['xmlns'] + 'Group':
+                xccdf_dict['group'] = iter_groups(events, root, xccdf_dict)
+                break
+            continue
+
+        depth = depth - 1
+        if depth == 1:
+            parse_header(elem, xccdf_dict)
+            root.clear()
+
+    return xccdf_dict
+
+# Add a top level benchmark element to the dictionary
+def parse_header(elem, xccdf_dict):
+
+    tag = elem.tag
+    if tag == nameSpace['xmlns'] + 'status' and xccdf_dict['status'] == None:
+        xccdf_dict['status'] = {
+            'date': elem.attrib['date'],
+            'result': elem.text,
+        }
+    elif tag == nameSpace['xmlns'] + 'title' and xccdf_dict['title'] == None:
+        xccdf_dict['title'] = elem.text
+    elif tag == nameSpace['xmlns'] + 'description' and xccdf_dict['description'] == None:
+        xccdf_dict['description'] = elem.text
+    elif tag == nameSpace['xmlns'] + 'reference' and xccdf_dict['reference'] == None:
+        xccdf_dict['reference'] = {
+            'publisher': elem.find(nameSpace['dc'] + 'publisher').text,
+            'source': elem.find(nameSpace['dc'] + 'source').text,
+        }
+    elif tag == nameSpace['xmlns'] + 'plain-text' and elem.attrib.get('id') in ['release-info', 'generator', 'conventionsVersion']:
+        if xccdf_dict[elem.attrib['id']] == None:
+            xccdf_dict[elem.attrib['id']] = elem.text
+    elif tag == nameSpace['xmlns'] + 'version' and xccdf_dict['version'] == None:
+        xccdf_dict['version'] = elem.text
+
     # Add profile data
-    for p in root.findall(nameSpace['xmlns'] + 'Profile'):
-        profile = p.attrib['id']
+    elif tag == nameSpace['xmlns'] + 'Profile':
+        profile = elem.attrib['id']
         xccdf_dict[profile] = {
-            'title': p.find(nameSpace['xmlns'] + 'title').text,
-            'description': p.find(nameSpace['xmlns'] + 'description').text,
+            'title': elem.find(nameSpace['xmlns'] + 'title').text,
+            'description': elem.find(nameSpace['xmlns'] + 'description').text,
             'selected': {}
         }
-        for child in p.findall(nameSpace['xmlns'] + 'select'):
+        for child in elem.findall(nameSpace['xmlns'] + 'select'):
             xccdf_dict[profile]['selected'][child.attrib['idref']] = child.attrib['selected']
-            
-    # Add group data
-    for g in root.findall(nameSpace['xmlns'] + 'Group'):
-        vulnId = g.attrib['id']
-
-        # Add static content
-        xccdf_dict['group'][vulnId] = {
-            'title': g.find(nameSpace['xmlns'] + 'title').text,
-            'description': g.find(nameSpace['xmlns'] + 'description').text,
-            'rule': {},
-        }
 
-        # Add rule child elements
-        for r in g.findall(nameSpace['xmlns'] + 'Rule'):
-            
-            # Handle exceptions
-            try:
-                check_content = r.find(nameSpace['xmlns'] + 'check/' + nameSpace['xmlns'] + 'check-content').text
-            except AttributeError:
-                check_content = None
-            
-            description = r.find(nameSpace['xmlns'] + 'description').text
-            xccdf_dict['group'][vulnId]['rule'] = {
-                'version': r.find(nameSpace['xmlns'] + 'version').text,
-                'title': r.find(nameSpace['xmlns'] + 'title').text,
-                'description': {
-                    'VulnDiscussion': find_between(description, "<VulnDiscussion>", "</VulnDiscussion>"),
-                    'FalsePositives': find_between(description, "<FalsePositives>", "</FalsePositives>"),
-                    'FalseNegatives': find_between(description, "<FalseNegatives>", "</FalseNegatives>"),
-                    'Documentable': find_between(description, "<Documentable>", "</Documentable>"),
-                    'Mitigations': find_between(description, "<Mitigations>", "</Mitigations>"),
-                    'SeverityOverrideGuidance': find_between(description, "<SeverityOverrideGuidance>", "</SeverityOverrideGuidance>"),
-                    'PotentialImpacts': find_between(description, "<PotentialImpacts>", "</PotentialImpacts>"),
-                    'ThirdPartyTools': find_between(description, "<ThirdPartyTools>", "</ThirdPartyTools>"),
-                    'MitigationControl': find_between(description, "<MitigationControl>", "</MitigationControl>"),
-                    'Responsibility': find_between(description, "<Responsibility>", "</Responsibility>"),
-                    'IAControls': find_between(description, "<IAControls>", "</IAControls>"),
-                },
-                'reference': {},
-                'legacyId': [],
-                'CCI': [],
-                'fixref': r.find(nameSpace['xmlns'] + 'fixtext').attrib['fixref'],
-                'fixtext': r.find(nameSpace['xmlns'] + 'fixtext').text,
-                'check': {
-                    'ref': r.find(nameSpace['xmlns'] + 'check/' + nameSpace['xmlns'] + 'check-content-ref').attrib['href'],
-                    'content': check_content,
-                }
+# Yield each group as it is completed, discarding it afterwards
+def iter_groups(events, root, xccdf_dict):
+
+    depth = 2
+    for event, elem in events:
+        if event == 'start':
+            depth = depth + 1
+            continue
+
+        depth = depth - 1
+        if depth == 1:
+            if elem.tag == nameSpace['xmlns'] + 'Group':
+                yield parse_group(elem)
+            else:
+                parse_header(elem, xccdf_dict)
+            root.clear()
+
+# Parse a single group element
+def parse_group(g):
+
+    vulnId = g.attrib['id']
+
+    # Add static content
+    group = {
+        'title': g.find(nameSpace['xmlns'] + 'title').text,
+        'description': g.find(nameSpace['xmlns'] + 'description').text,
+        'rule': {},
+    }
+
+    # Add rule child elements
+    for r in g.findall(nameSpace['xmlns'] + 'Rule'):
+
+        # Handle exceptions
+        try:
+            check_content = r.find(nameSpace['xmlns'] + 'check/' + nameSpace['xmlns'] + 'check-content').text
+        except AttributeError:
+            check_content = None
+
+        description = r.find(nameSpace['xmlns'] + 'description').text
+        fixtext = r.find(nameSpace['xmlns'] + 'fixtext')
+        group['rule'] = {
+            'version': r.find(nameSpace['xmlns'] + 'version').text,
+            'title': r.find(nameSpace['xmlns'] + 'title').text,
+            'description': parse_description(description),
+            'reference': {},
+            'legacyId': [],
+            'CCI': [],
+            'fixref': fixtext.attrib['fixref'],
+            'fixtext': fixtext.text,
+            'check': {
+                'ref': r.find(nameSpace['xmlns'] + 'check/' + nameSpace['xmlns'] + 'check-content-ref').attrib['href'],
+                'content': check_content,
             }
-            
-            # Add rule id info
-            for a in g.find(nameSpace['xmlns'] + 'Rule').attrib:
-                xccdf_dict['group'][vulnId]['rule'][a] = g.find(nameSpace['xmlns'] + 'Rule').attrib[a]
-            
-            # Add reference child elements
-            try:
-                for child in r.find(nameSpace['xmlns'] + 'reference'):
-                    xccdf_dict['group'][vulnId]['rule']['reference'][child.tag.split("}")[-1]] = child.text
-            except TypeError:
-                 xccdf_dict['group'][vulnId]['rule']['reference'] = None
-
-            # Add legacy Ids and CCI
-            for i in r.findall(nameSpace['xmlns'] + 'ident'):
-                if i.text[:4].lower() == 'cci-':
-                    xccdf_dict['group'][vulnId]['rule']['CCI'].append(i.text)
-                else:
-                    xccdf_dict['group'][vulnId]['rule']['legacyId'].append(i.text)
-    
-    return xccdf_dict
+        }
+
+        # Add rule id info
+        group['rule'].update(r.attrib)
+
+        # Add reference child elements
+        try:
+            for child in r.find(nameSpace['xmlns'] + 'reference'):
+                group['rule']['reference'][child.tag.split("}")[-1]] = child.text
+        except TypeError:
+             group['rule']['reference'] = None
+
+        # Add legacy Ids and CCI
+        for i in r.findall(nameSpace['xmlns'] + 'ident'):
+            if i.text[:4].lower() == 'cci-':
+                group['rule']['CCI'].append(i.text)
+            else:
+                group['rule']['legacyId'].append(i.text)
+
+    return vulnId, group
 
 # Create checklist from parsed xccdf file
 def generate_ckl(xccdf_dict, host_data=None, version = '2.17'):
-    
+
+    ckl = StringIO()
+    write_ckl(xccdf_dict, ckl, host_data, version)
+
+    return ckl.getvalue()
+
+# Default asset information of a checklist
+def default_host_data():
+
+    host_data = {
+        'ROLE': 'None',
+        'ASSET_TYPE': 'Computing',
+        'MARKING': 'CUI',
+        'HOST_NAME': None,
+        'HOST_IP': None,
+        'HOST_MAC': None,
+        'HOST_FQDN': None,
+        'TARGET_COMMENT': None,
+        'TECH_AREA': None,
+        'TARGET_KEY': '4072',
+        'WEB_OR_DATABASE': 'false',
+        'WEB_DB_SITE': None,
+        'WEB_DB_INSTANCE': None,
+    }
+
+    return host_data
+
+# Escape element text the same way ElementTree does
+def escape_text(text):
+
+    if "&" in text:
+        text = text.replace("&", "&amp;")
+    if "<" in text:
+        text = text.replace("<", "&lt;")
+    if ">" in text:
+        text = text.replace(">", "&gt;")
+
+    return text
+
+# Leaf element on its own indented line, empty text is written as an open and close tag
+def ckl_element(tag, text, indent):
+
+    return "\n" + "\t"*indent + "<" + tag + ">" + (escape_text(text) if text else "") + "</" + tag + ">"
+
+# Write a checklist straight to a text stream, byte for byte what ET.indent and ET.tostring produced
+# answers from read_answers carry over the review of an older checklist, returns how many VULN matched
+def write_ckl(xccdf_dict, out, host_data=None, version = '2.17', answers = None):
+
     # Set default asset information
     if host_data == None:
-        host_data = {
-            'ROLE': 'None',
-            'ASSET_TYPE': 'Computing',
-            'MARKING': 'CUI',
-            'HOST_NAME': None,
-            'HOST_IP': None,
-            'HOST_MAC': None,
-            'HOST_FQDN': None,
-            'TARGET_COMMENT': None,
-            'TECH_AREA': None,
-            'TARGET_KEY': '4072',
-            'WEB_OR_DATABASE': 'false',
-            'WEB_DB_SITE': None,
-            'WEB_DB_INSTANCE': None,
-        }
-    
-    # Create xml structure
-    CHECKLIST = ET.Element('CHECKLIST')
-    ASSET = ET.SubElement(CHECKLIST, 'ASSET')
-    
-    ## GENERATE asset ELEMENTS
-    for element in host_data:
-        ET.SubElement(ASSET, element).text = host_data[element]
-    
-    # Generate STIG, ISTIG, STIG_INFO ELEMENTS
-    STIGS = ET.SubElement(CHECKLIST, 'STIGS')
-    ISTIG = ET.SubElement(STIGS, 'iSTIG')
-    STIG_INFO = ET.SubElement(ISTIG, 'STIG_INFO')
-    
+        host_data = default_host_data()
+    write = out.write
+
+    # Declaration, STIG viewer comment and asset elements
+    write("<?xml version='1.0' encoding='UTF-8'?>\n<!--DISA STIG Viewer :: " + version + "-->\n<CHECKLIST>\n\t<ASSET>")
+    if host_data:
+        for element in host_data:
+            write(ckl_element(element, host_data[element], 2))
+        write("\n\t</ASSET>")
+    else:
+        write("</ASSET>")
+
     # Populate STIG_INFO
     stig_data = {
         'version': xccdf_dict['version'],
@@ -580,89 +1352,259 @@ def generate_ckl(xccdf_dict, host_data=None, version = '2.17'):
         'notice': 'terms-of-use',
         'source': xccdf_dict['reference']['source'],
     }
+    write("\n\t<STIGS>\n\t\t<iSTIG>\n\t\t\t<STIG_INFO>")
     for element in stig_data:
-        SI_DATA = ET.SubElement(STIG_INFO, 'SI_DATA')
-        ET.SubElement(SI_DATA, 'SID_NAME').text = element
+        write("\n\t\t\t\t<SI_DATA>" + ckl_element('SID_NAME', element, 5))
         if stig_data[element]:
-            ET.SubElement(SI_DATA, 'SID_DATA').text = stig_data[element]
-    
+            write(ckl_element('SID_DATA', stig_data[element], 5))
+        write("\n\t\t\t\t</SI_DATA>")
+    write("\n\t\t\t</STIG_INFO>")
+
     # Determine if manual or benchmark
     if 'manual' in stig_data['filename'].lower():
         manual = True
     else:
         manual = False
-    
-    # Populate rules
-    for g in xccdf_dict['group']:
-        VULN = ET.SubElement(ISTIG, 'VULN')
-        
+    STIGRef = xccdf_dict['title'] + " :: Version " + xccdf_dict['version'] + ", " + xccdf_dict['release-info']
+    matched = 0
+
+    # Populate rules, groups may be a dictionary or a generator from iter_xccdf
+    groups = xccdf_dict['group']
+    if isinstance(groups, dict):
+        groups = groups.items()
+    for g, group in groups:
+        rule = group['rule']
+        description = rule['description']
+
         # Handle exceptions in formating
         try:
-            TargetKey = xccdf_dict['group'][g]['rule']['reference']['identifier']
+            TargetKey = rule['reference']['identifier']
         except:
             TargetKey = None
-        
+
         # Populate STIG data
-        vuln_data = {
-            'Vuln_Num': g,
-            'Severity': xccdf_dict['group'][g]['rule']['severity'],
-            'Group_Title': xccdf_dict['group'][g]['title'],
-            'Rule_ID': xccdf_dict['group'][g]['rule']['id'],
-            'Rule_Ver': xccdf_dict['group'][g]['rule']['version'],
-            'Rule_Title': xccdf_dict['group'][g]['rule']['title'],
-            'Vuln_Discuss': xccdf_dict['group'][g]['rule']['description']['VulnDiscussion'],
-            'IA_Controls': xccdf_dict['group'][g]['rule']['description']['IAControls'],
-            'Check_Content': xccdf_dict['group'][g]['rule']['check']['content'],
-            'Fix_Text': xccdf_dict['group'][g]['rule']['fixtext'],
-            'False_Positives': xccdf_dict['group'][g]['rule']['description']['FalsePositives'],
-            'False_Negatives': xccdf_dict['group'][g]['rule']['description']['FalseNegatives'],
-            'Documentable': xccdf_dict['group'][g]['rule']['description']['Documentable'],
-            'Mitigations': xccdf_dict['group'][g]['rule']['description']['Mitigations'],
-            'Potential_Impact': xccdf_dict['group'][g]['rule']['description']['PotentialImpacts'],
-            'Third_Party_Tools': xccdf_dict['group'][g]['rule']['description']['ThirdPartyTools'],
-            'Mitigation_Control': xccdf_dict['group'][g]['rule']['description']['MitigationControl'],
-            'Responsibility': xccdf_dict['group'][g]['rule']['description']['Responsibility'],
-            'Security_Override_Guidance': xccdf_dict['group'][g]['rule']['description']['SeverityOverrideGuidance'],
-            'Check_Content_Ref': 'M' if manual else xccdf_dict['group'][g]['rule']['check']['ref'],
-            'Weight': xccdf_dict['group'][g]['rule']['weight'],
-            'Class': 'Unclass',
-            'STIGRef': xccdf_dict['title'] + " :: Version " + xccdf_dict['version'] + ", " + xccdf_dict['release-info'],
-            'TargetKey': TargetKey,
-            'STIG_UUID': stig_data['uuid'],
-        }
-            
-        for v in vuln_data:
-            STIG_DATA = ET.SubElement(VULN, 'STIG_DATA')
-            ET.SubElement(STIG_DATA, 'VULN_ATTRIBUTE').text = v
-            ET.SubElement(STIG_DATA, 'ATTRIBUTE_DATA').text = vuln_data[v]
-        
+        vuln_data = [
+            ('Vuln_Num', g),
+            ('Severity', rule['severity']),
+            ('Group_Title', group['title']),
+            ('Rule_ID', rule['id']),
+            ('Rule_Ver', rule['version']),
+            ('Rule_Title', rule['title']),
+            ('Vuln_Discuss', description['VulnDiscussion']),
+            ('IA_Controls', description['IAControls']),
+            ('Check_Content', rule['check']['content']),
+            ('Fix_Text', rule['fixtext']),
+            ('False_Positives', description['FalsePositives']),
+            ('False_Negatives', description['FalseNegatives']),
+            ('Documentable', description['Documentable']),
+            ('Mitigations', description['Mitigations']),
+            ('Potential_Impact', description['PotentialImpacts']),
+            ('Third_Party_Tools', description['ThirdPartyTools']),
+            ('Mitigation_Control', description['MitigationControl']),
+            ('Responsibility', description['Responsibility']),
+            ('Security_Override_Guidance', description['SeverityOverrideGuidance']),
+            ('Check_Content_Ref', 'M' if manual else rule['check']['ref']),
+            ('Weight', rule['weight']),
+            ('Class', 'Unclass'),
+            ('STIGRef', STIGRef),
+            ('TargetKey', TargetKey),
+            ('STIG_UUID', stig_data['uuid']),
+        ]
         if manual:
-            # Legacy IDs
-            for i in xccdf_dict['group'][g]['rule']['legacyId']:
-                STIG_DATA = ET.SubElement(VULN, 'STIG_DATA')
-                ET.SubElement(STIG_DATA, 'VULN_ATTRIBUTE').text = 'LEGACY_ID'
-                ET.SubElement(STIG_DATA, 'ATTRIBUTE_DATA').text = i
-
-            # Add CCI
-            for i in xccdf_dict['group'][g]['rule']['CCI']:
-                STIG_DATA = ET.SubElement(VULN, 'STIG_DATA')
-                ET.SubElement(STIG_DATA, 'VULN_ATTRIBUTE').text = 'CCI_REF'
-                ET.SubElement(STIG_DATA, 'ATTRIBUTE_DATA').text = i
-            
+            vuln_data = vuln_data + [('LEGACY_ID', i) for i in rule['legacyId']] + [('CCI_REF', i) for i in rule['CCI']]
+
+        write("\n\t\t\t<VULN>")
+        for attribute, data in vuln_data:
+            write(stigDataOpen[attribute] + (escape_text(data) if data else "") + stigDataClose)
+
         # Add status, details, comments, severity override, and justification
-        ET.SubElement(VULN, 'STATUS').text = 'Not_Reviewed'
-        ET.SubElement(VULN, 'FINDING_DETAILS').text = ''
-        ET.SubElement(VULN, 'COMMENTS').text = ''
-        ET.SubElement(VULN, 'SEVERITY_OVERRIDE').text = ''
-        ET.SubElement(VULN, 'SEVERITY_JUSTIFICATION').text = ''
-    
-    # Convert to checklist
-    ET.indent(CHECKLIST, space = '\t', level=0)
-    comment = '\n<!--DISA STIG Viewer :: ' + version + '-->\n'
-    ckl = ET.tostring(CHECKLIST, encoding="UTF-8", xml_declaration=True, short_empty_elements=False)
-    ckl = ckl.decode("UTF-8").split("\n",1)[0] + comment + ckl.decode("UTF-8").split("\n",1)[1]
+        answer = None
+        if answers:
+            answer = answers['vuln'].get(g) or answers['rule'].get(rule_base(rule['id']))
+        if answer:
+            matched = matched + 1
+            write(''.join(ckl_element(tag, answer.get(tag), 4) for tag in answerTags) + "\n\t\t\t</VULN>")
+        else:
+            write(vulnStatus + "\n\t\t\t</VULN>")
+
+    write("\n\t\t</iSTIG>\n\t</STIGS>\n</CHECKLIST>")
+
+    return matched
+
+# Pre-indented STIG_DATA fragments of each VULN
+stigDataOpen = {a: "\n\t\t\t\t<STIG_DATA>" + ckl_element('VULN_ATTRIBUTE', a, 5) + "\n\t\t\t\t\t<ATTRIBUTE_DATA>" for a in [
+    'Vuln_Num', 'Severity', 'Group_Title', 'Rule_ID', 'Rule_Ver', 'Rule_Title', 'Vuln_Discuss', 'IA_Controls',
+    'Check_Content', 'Fix_Text', 'False_Positives', 'False_Negatives', 'Documentable', 'Mitigations',
+    'Potential_Impact', 'Third_Party_Tools', 'Mitigation_Control', 'Responsibility', 'Security_Override_Guidance',
+    'Check_Content_Ref', 'Weight', 'Class', 'STIGRef', 'TargetKey', 'STIG_UUID', 'LEGACY_ID', 'CCI_REF',
+]}
+stigDataClose = "</ATTRIBUTE_DATA>\n\t\t\t\t</STIG_DATA>"
+answerTags = ['STATUS', 'FINDING_DETAILS', 'COMMENTS', 'SEVERITY_OVERRIDE', 'SEVERITY_JUSTIFICATION']
+vulnStatus = ''.join(ckl_element(tag, text, 4) for tag, text in [
+    ('STATUS', 'Not_Reviewed'),
+    ('FINDING_DETAILS', ''),
+    ('COMMENTS', ''),
+    ('SEVERITY_OVERRIDE', ''),
+    ('SEVERITY_JUSTIFICATION', ''),
+])
+
+# Rule_ID without its revision, 'SV-230221r743913_rule' becomes 'SV-230221'
+def rule_base(ruleId):
+
+    return re.sub(r'r\d+_rule$', '', str(ruleId))
+
+# Index the review of a checklist by Vuln_Num and by revision-less Rule_ID in one pass
+def read_answers(source):
+
+    answers = {
+        'ASSET': {},
+        'STIG_INFO': {},
+        'vuln': {},
+        'rule': {},
+    }
+
+    asset = False
+    for event, elem in ET.iterparse(source):
+        tag = elem.tag
+
+        # Parse asset info
+        if tag == 'ASSET' and not asset:
+            for a in elem:
+                answers['ASSET'][a.tag] = a.text
+            asset = True
+
+        # Parse stig info
+        elif tag == 'SI_DATA':
+            answers['STIG_INFO'][elem.findtext('SID_NAME')] = elem.findtext('SID_DATA')
+
+        # Keep only the answers of each VULN
+        elif tag == 'VULN':
+            attributes = {}
+            answer = {}
+            for child in elem:
+                if child.tag == 'STIG_DATA':
+                    attributes[child.findtext('VULN_ATTRIBUTE')] = child.findtext('ATTRIBUTE_DATA')
+                elif child.tag in answerTags:
+                    answer[child.tag] = child.text
+            if attributes.get('Vuln_Num'):
+                answers['vuln'][attributes['Vuln_Num']] = answer
+            if attributes.get('Rule_ID'):
+                answers['rule'][rule_base(attributes['Rule_ID'])] = answer
+            elem.clear()
+
+    return answers
+
+# Upgrade checklists of one STIG to a newer release, carrying over their answers, run in a worker process
+def upgrade_ckls(xccdf_dict, paths):
+
+    upgraded = []
+    for fPath in paths:
+        answers = read_answers(fPath)
+
+        # Already on this release
+        if answers['STIG_INFO'].get('version') == xccdf_dict['version'] and answers['STIG_INFO'].get('releaseinfo') == xccdf_dict['release-info']:
+            continue
+
+        # An existing checklist is never overwritten, even one created since the upgrade was planned
+        fileName = os.path.join(os.path.dirname(fPath), name_xccdf_ckl(xccdf_dict, answers['ASSET']))
+        try:
+            with open(fileName, 'x', encoding = 'UTF-8', newline = '') as f:
+                matched = write_ckl(xccdf_dict, f, answers['ASSET'], answers = answers)
+        except FileExistsError:
+            continue
+        upgraded.append((fPath, fileName, matched))
+
+    return upgraded
+
+# ASSET and STIG_INFO of a checklist, reading no further than its STIG_INFO
+def ckl_header(fPath):
+
+    asset = {}
+    info = {}
+    with open(fPath, 'rb') as f:
+        for event, elem in ET.iterparse(f):
+            if elem.tag == 'ASSET' and not asset:
+                for a in elem:
+                    asset[a.tag] = a.text
+            elif elem.tag == 'SI_DATA':
+                info[elem.findtext('SID_NAME')] = elem.findtext('SID_DATA')
+            elif elem.tag == 'STIG_INFO':
+                break
+
+    return asset, info
+
+# Host name and stigid of a checklist
+def ckl_key(fPath):
+
+    asset, info = ckl_header(fPath)
+
+    return fPath, (asset.get('HOST_NAME'), info.get('stigid'))
+
+# Status changes between two checklists as rows of (Host, STIG_ID, Vuln_Num, Rule_ID, Severity, Change, Old_Status, New_Status)
+# VULN are matched by Vuln_Num, changes are a status transition, a new rule or a removed rule
+def diff_ckl(pair):
+
+    oldPath, newPath = pair
+    old = {v[0]: v[1:4] for v in scan_ckl(oldPath, vulns = True)['VULN']}
+    ckl_dict = scan_ckl(newPath, vulns = True)
+    new = {v[0]: v[1:4] for v in ckl_dict['VULN']}
+    key = (ckl_dict['ASSET'].get('HOST_NAME'), ckl_dict['STIG_INFO'].get('stigid'))
+
+    changes = []
+    for v in sorted(old.keys() | new.keys()):
+        if v not in new:
+            changes.append(key + (v, old[v][0], old[v][1], 'removed', old[v][2], None))
+        elif v not in old:
+            changes.append(key + (v, new[v][0], new[v][1], 'new', None, new[v][2]))
+        elif old[v][2] != new[v][2]:
+            changes.append(key + (v, new[v][0], new[v][1], 'transition', old[v][2], new[v][2]))
+
+    return changes
+
+# Stream the DISA CCI list, from its xml or the zip it is published in
+# Yields (cci, type, status, definition, [(revision, control, reference)]) for each cci_item
+def iter_cci_list(fileName):
 
-    return ckl
+    source = fileName
+    member = zipfile_member(fileName)
+    if member:
+        with ZipFile(fileName) as z:
+            source = BytesIO(z.read(member))
+
+    for event, elem in ET.iterparse(source):
+        if elem.tag.split('}')[-1] != 'cci_item':
+            continue
+
+        fields = {}
+        references = []
+        for child in elem.iter():
+            tag = child.tag.split('}')[-1]
+            if tag == 'reference':
+                control = nist_control(child.get('index', ''))
+                if control and re.match(r'NIST SP 800-53( |$)', child.get('title', '')):
+                    references.append((child.get('version'), control, child.get('index')))
+            else:
+                fields[tag] = child.text
+        yield elem.get('id'), fields.get('type'), fields.get('status'), fields.get('definition'), references
+        elem.clear()
+
+# Name of the CCI list xml inside a zip, None if fileName is not a zip
+def zipfile_member(fileName):
+
+    try:
+        with ZipFile(fileName) as z:
+            return [n for n in z.namelist() if n.lower().endswith('.xml')][0]
+    except (BadZipFile, IndexError):
+        return None
+
+# NIST SP 800-53 control of a CCI reference index such as 'AC-2 (4)' or 'AC-1 a 1'
+def nist_control(index):
+
+    match = re.match(r'\s*([A-Z]{2}-\d+)\s*(\(\d+\))?', index)
+    if not match:
+        return None
+
+    return match.group(1) + (match.group(2) or '')
 
 # Parse ckl contents into dictionary
 def parse_ckl(ckl):
@@ -723,6 +1665,81 @@ def parse_ckl(ckl):
                     
     return ckl_dict
 
+# Scan the summary, severity counts, asset and stig info of a ckl file without keeping any VULN
+# With vulns, the Vuln_Num, Rule_ID, Severity, STATUS and CCI_REF of each VULN are kept as tuples
+def scan_ckl(source, vulns = False):
+
+    if isinstance(source, (bytes, str)) and not os.path.isfile(source):
+        source = BytesIO(source.encode('UTF-8') if isinstance(source, str) else source)
+
+    ckl_dict = {
+        'summary': {
+            'Not_Reviewed': 0,
+            'NotAFinding': 0,
+            'Not_Applicable': 0,
+            'Open': 0,
+            'Missing_Details': 0,
+            'Missing_Comments': 0,
+        },
+        'ASSET': {},
+        'STIG_INFO': {},
+        'severity': {},
+    }
+    if vulns:
+        ckl_dict['VULN'] = []
+
+    # Only ASSET, SI_DATA and VULN are handed back, lxml builds everything else without python objects
+    asset = False
+    for event, elem in etree.iterparse(source, tag = ('ASSET', 'SI_DATA', 'VULN'), resolve_entities = False, remove_comments = True, remove_pis = True):
+        tag = elem.tag
+
+        # Parse asset info
+        if tag == 'ASSET' and not asset:
+            for a in elem:
+                ckl_dict['ASSET'][a.tag] = a.text
+            asset = True
+
+        # Parse stig info
+        elif tag == 'SI_DATA':
+            try:
+                ckl_dict['STIG_INFO'][elem.find('SID_NAME').text] = elem.find('SID_DATA').text
+            except AttributeError:
+                ckl_dict['STIG_INFO'][elem.find('SID_NAME').text] = None
+
+        # Count the VULN in the summary and by severity and status, then discard it
+        elif tag == 'VULN':
+            attributes = {}
+            cci = []
+            status = None
+            for child in elem.iterchildren('STIG_DATA', 'STATUS', 'FINDING_DETAILS', 'COMMENTS'):
+                if child.tag == 'STIG_DATA':
+
+                    # VULN_ATTRIBUTE then ATTRIBUTE_DATA, read by position instead of searching for each
+                    if len(child) == 2 and child[0].tag == 'VULN_ATTRIBUTE' and child[1].tag == 'ATTRIBUTE_DATA':
+                        attribute, data = child[0].text or '', child[1].text or ''
+                    else:
+                        attribute, data = child.findtext('VULN_ATTRIBUTE'), child.findtext('ATTRIBUTE_DATA')
+                    if attribute == 'CCI_REF':
+                        cci.append(data)
+                    else:
+                        attributes[attribute] = data
+                elif child.tag == 'STATUS':
+                    status = child.text
+                    ckl_dict['summary'][status] += 1
+                elif child.text == None:
+                    ckl_dict['summary']['Missing_Details' if child.tag == 'FINDING_DETAILS' else 'Missing_Comments'] += 1
+            counts = ckl_dict['severity'].setdefault(attributes.get('Severity'), {})
+            counts[status] = counts.get(status, 0) + 1
+            if vulns:
+                ckl_dict['VULN'].append((attributes.get('Vuln_Num'), attributes.get('Rule_ID'), attributes.get('Severity'), status, ' '.join(cci)))
+
+            # Drop the VULN and those before it so memory stays flat on large checklists
+            elem.clear()
+            while elem.getprevious() is not None:
+                del elem.getparent()[0]
+
+    return ckl_dict
+
 # Generate a standard name based on parsed ckl
 def name_ckl(ckl_dict):
     
@@ -750,11 +1767,33 @@ def name_ckl(ckl_dict):
     
     return fileName
 
-# Index file contents recursively
-def index_files(rootDir):
-    content = set()
-    for root, subFolders, files in os.walk(rootDir):
-        for f in files:
-            content.add(os.path.join(root, f))
-            
-    return content
\ No newline at end of file
+# Generate the standard checklist name from parsed xccdf and host data, without parsing the checklist
+def name_xccdf_ckl(xccdf_dict, host_data):
+
+    ckl_dict = {
+        'ASSET': host_data,
+        'STIG_INFO': {
+            'stigid': xccdf_dict['benchmark']['id'],
+            'version': xccdf_dict['version'],
+            'releaseinfo': xccdf_dict['release-info'],
+        },
+    }
+
+    return name_ckl(ckl_dict)
+
+# Discover files recursively with os.scandir, yielding (path, size, mtime)
+def scan_files(rootDir):
+
+    folders = [rootDir]
+    while folders:
+        try:
+            entries = os.scandir(folders.pop())
+        except OSError:
+            continue
+        with entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks = False):
+                    folders.append(entry.path)
+                elif entry.is_file():
+                    stat = entry.stat()
+                    yield entry.path, stat.st_size, stat.st_mtime
\ No newline at end of file
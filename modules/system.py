@@ -13,6 +13,10 @@ the environment file.
 import json
 import shutil
 import os
+import errno
+import hashlib
+import time
+import uuid
 
 # Create environment class which stores data about how the application will behave
 class environment:
@@ -83,12 +87,22 @@ class environment:
             # Create default environment variables
             defaults = {
                 'STIG Repository Path': 'exports',
+                'Sort Conflict Policy': 'skip',
+            }
+
+            # Variables limited to a fixed set of values
+            choices = {
+                'Sort Conflict Policy': move_plan.policies,
             }
 
             # Set new value
             print("\n'" + str(key) + "' current value = " + str(self.env[key]))
             if key in defaults:
-                newValue = input("Set new value for '" + str(key) + "' (leave empty for default value '" + defaults[key] + "'); ")
+                while True:
+                    newValue = input("Set new value for '" + str(key) + "' (leave empty for default value '" + defaults[key] + "'); ")
+                    if newValue == '' or key not in choices or newValue in choices[key]:
+                        break
+                    print("\nNot a valid option, choose from " + str(choices[key]) + ".")
                 if newValue == '':
                     self.env[key] = defaults[key]
                 else:
@@ -131,13 +145,15 @@ def menu(title, options):
 
     return choice
 
-# Move files
+# Move files, returning whether the file was moved
 def move_file(src, des):
 
+    moved = False
     if src == des:
         None
     elif not os.path.exists(des):
         shutil.move(src,des)
+        moved = True
     else:
         print('\nMoving ' + src + '...')
         choice = ''
@@ -145,6 +161,259 @@ def move_file(src, des):
             choice = input(des + " already exists.\nOverwrite (y/n)? ").lower()
         if choice == 'y':
             shutil.move(src,des)
+            moved = True
         else:
             None
-        print('\n')
\ No newline at end of file
+        print('\n')
+
+    return moved
+
+# SHA-256 of a file, read in chunks
+def file_hash(path, chunkSize = 1024*1024):
+
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunkSize), b''):
+            h.update(chunk)
+
+    return h.hexdigest()
+
+# SHA-256 of the first bytes of a file, cheap enough to split size groups before a full hash
+def partial_hash(path, length = 64*1024):
+
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read(length)).hexdigest()
+
+# Group files with identical content, narrowing by size, then partial hash, then full hash
+# files is an iterable of (path, size, ...) and each group lists its paths in sorted order
+def find_duplicates(files, partialSize = 64*1024):
+
+    # Paths sharing a size, existing hardlinks of one file only count once
+    sizes = {}
+    for f in files:
+        sizes.setdefault(f[1], []).append(f[0])
+
+    groups = []
+    for size, paths in sizes.items():
+        if len(paths) < 2:
+            continue
+        inodes = {}
+        for path in sorted(paths):
+            stat = os.stat(path)
+            inodes.setdefault((stat.st_dev, stat.st_ino), path)
+        paths = sorted(inodes.values())
+        if len(paths) < 2:
+            continue
+
+        # Full hashes only for files whose first bytes already match
+        partial = {}
+        for path in paths:
+            partial.setdefault(partial_hash(path, partialSize), []).append(path)
+        for candidates in partial.values():
+            if len(candidates) < 2:
+                continue
+            if size <= partialSize:
+                groups.append((size, candidates))
+                continue
+            full = {}
+            for path in candidates:
+                full.setdefault(file_hash(path), []).append(path)
+            groups.extend([(size, g) for g in full.values() if len(g) > 1])
+
+    return [g for size, g in sorted(groups, key = lambda g: g[1])], sum([size*(len(g) - 1) for size, g in groups])
+
+# Replace duplicates with hardlinks to the first file of each group
+def link_duplicates(groups):
+
+    linked = 0
+    for group in groups:
+        for path in group[1:]:
+            temp = path + '.link'
+            try:
+                os.link(group[0], temp)
+                os.replace(temp, path)
+                linked = linked + 1
+            except OSError as e:
+                if os.path.exists(temp):
+                    os.remove(temp)
+                print("\nUnable to link " + path + ": " + str(e))
+
+    return linked
+
+# Move a file, renaming in place on the same filesystem and copying across devices
+def replace_file(src, des):
+    try:
+        os.replace(src, des)
+    except OSError as e:
+        if e.errno != errno.EXDEV:
+            raise
+        shutil.move(src, des)
+
+# Plan of file moves, resolved against a conflict policy before anything is moved
+class move_plan:
+
+    policies = ['skip', 'newest', 'version']
+
+    def __init__(self, policy = 'skip', journal = os.path.join('data', 'move_journal.jsonl')):
+        if policy not in self.policies:
+            raise ValueError(str(policy) + " is not a valid conflict policy " + str(self.policies))
+        self.policy = policy
+        self.journal = journal
+        self.backupDir = os.path.join(os.path.dirname(journal), 'move_backup')
+        self.requests = []
+        self.actions = []
+
+    # Queue a move, nothing is decided until resolve
+    def add(self, src, des):
+        if src != des:
+            self.requests.append((src, des))
+
+    # Decide every move in a deterministic order
+    # Actions are (action, src, des) where action is move, replace, rename, identical or conflict
+    # A file moving away from a destination is decided, and applied, before the moves into its place
+    def resolve(self):
+
+        self.actions = []
+        self.claimed = {}
+        self.pending = dict(self.requests)
+        self.decided = {}
+        for src in sorted(self.pending):
+            self.resolve_move(src)
+
+        return self.actions
+
+    # Decide the move of one source, returning its action
+    def resolve_move(self, src):
+
+        if src in self.decided:
+            return self.decided[src]
+
+        # Files moving in a cycle stay where they are
+        self.decided[src] = 'conflict'
+        des = self.pending[src]
+
+        # Compare against a file already on disk or claimed earlier in this plan
+        existing = self.claimed.get(des)
+        if existing == None and os.path.exists(des):
+            existing = des
+
+            # The file at the destination may be moving somewhere else first
+            if des in self.pending and self.resolve_move(des) in ['move', 'replace', 'rename']:
+                existing = self.claimed.get(des)
+        if existing == None:
+            self.claimed[des] = src
+            return self.decide('move', src, des)
+
+        # Identical content never needs to move
+        if os.path.getsize(src) == os.path.getsize(existing) and file_hash(src) == file_hash(existing):
+            return self.decide('identical', src, des)
+
+        # Keep whichever file was modified last
+        elif self.policy == 'newest':
+            if os.path.getmtime(src) <= os.path.getmtime(existing):
+                return self.decide('conflict', src, des)
+            elif existing == des:
+                self.claimed[des] = src
+                return self.decide('replace', src, des)
+            else:
+                earlier = [a for a in self.actions if a[1] == existing][0]
+                self.actions[self.actions.index(earlier)] = ('conflict', existing, des)
+                self.decided[existing] = 'conflict'
+                self.claimed[des] = src
+                return self.decide(earlier[0], src, des)
+
+        # Keep both under a numbered name
+        elif self.policy == 'version':
+            root, ext = os.path.splitext(des)
+            n = 1
+            while root + '_' + str(n) + ext in self.claimed or os.path.exists(root + '_' + str(n) + ext):
+                n = n + 1
+            self.claimed[root + '_' + str(n) + ext] = src
+            return self.decide('rename', src, root + '_' + str(n) + ext)
+
+        # Leave differing files where they are
+        else:
+            return self.decide('conflict', src, des)
+
+    # Record the action decided for a source
+    def decide(self, action, src, des):
+
+        self.decided[src] = action
+        self.actions.append((action, src, des))
+
+        return action
+
+    # Dry run report of the resolved plan
+    def report(self):
+
+        totals = {}
+        for action, src, des in self.actions:
+            totals[action] = totals.get(action, 0) + 1
+            print(action.upper().ljust(10) + src + " -> " + des)
+        print(
+            "\n" + "-"*45 + "[MOVE PLAN]" + "-"*45,
+            *[a.ljust(10) + str(totals.get(a, 0)) for a in ['move', 'replace', 'rename', 'identical', 'conflict']],
+            "Conflict policy: " + self.policy,
+            sep = "\n"
+        )
+
+    # Carry out the plan, journaling each completed move so the run can be rolled back
+    def apply(self):
+
+        moves = [a for a in self.actions if a[0] in ['move', 'replace', 'rename']]
+        moved = []
+
+        # Files replaced in this run are set aside in a folder of their own
+        backupDir = os.path.join(self.backupDir, time.strftime('%Y%m%d%H%M%S') + '_' + uuid.uuid4().hex[:8])
+        with open(self.journal, 'w') as journal:
+            ptr = 0
+            for action, src, des in moves:
+
+                # Update completion status
+                ptr = ptr + 1
+                print("[" + "="*(round((ptr/len(moves))*100)) + " "*(100 - round((ptr/len(moves))*100)) + "]", end = "\r")
+
+                try:
+                    # Only a replace may land on an existing file, anything else left there since resolve is kept
+                    if action != 'replace' and os.path.exists(des):
+                        print("\nUnable to move " + src + ": " + des + " already exists")
+                        continue
+
+                    # Set aside the file being replaced so rollback can restore it
+                    if action == 'replace':
+                        if not os.path.exists(backupDir):
+                            os.makedirs(backupDir)
+                        backup = os.path.join(backupDir, hashlib.sha1(des.encode('utf-8')).hexdigest() + os.path.splitext(des)[1])
+                        replace_file(des, backup)
+                        journal.write(json.dumps({'src': des, 'des': backup}) + "\n")
+                    replace_file(src, des)
+                except OSError as e:
+                    print("\nUnable to move " + src + ": " + str(e))
+                    continue
+                journal.write(json.dumps({'src': src, 'des': des}) + "\n")
+                journal.flush()
+                moved.append((src, des))
+
+        if moves:
+            print("[" + "="*46 + "COMPLETE" + "="*46 + "]")
+
+        return moved
+
+# Undo the moves recorded in a journal, last move first
+def rollback_moves(journal = os.path.join('data', 'move_journal.jsonl')):
+
+    try:
+        with open(journal, 'r') as file:
+            entries = [json.loads(line) for line in file if line.strip()]
+    except OSError:
+        entries = []
+
+    restored = []
+    for entry in reversed(entries):
+        if os.path.exists(entry['des']) and not os.path.exists(entry['src']):
+            replace_file(entry['des'], entry['src'])
+            restored.append((entry['des'], entry['src']))
+    if os.path.exists(journal):
+        os.remove(journal)
+
+    return restored
\ No newline at end of file
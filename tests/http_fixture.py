@@ -0,0 +1,86 @@
+"""
+Local HTTP stand-in for the DoD Cyber Exchange
+
+Serves in-memory files with ETag and Last-Modified
+validators and honors Range, If-Range, If-None-Match
+and If-Modified-Since the way the real server does.
+"""
+
+import hashlib
+import threading
+import functools
+import http.server
+
+class handler(http.server.BaseHTTPRequestHandler):
+
+    def __init__(self, site, *args, **kwargs):
+        self.site = site
+        super().__init__(*args, **kwargs)
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        self.site.requests.append((self.path, dict(self.headers)))
+
+        # Queued error statuses are served before the file itself, with an html error page like a proxy or WAF
+        if self.site.errors.get(self.path):
+            status = self.site.errors[self.path].pop(0)
+            body = b'<html><body><h1>' + str(status).encode() + b' Error</h1></body></html>'
+            self.send_response(status)
+            self.send_header('Content-Type', 'text/html')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+        if self.path not in self.site.files:
+            self.send_response(404)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        body = self.site.files[self.path]
+        etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+        lastModified = self.site.lastModified
+        if self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+
+        # Range is only honored when If-Range, if sent, still matches
+        status = 200
+        start = 0
+        rng = self.headers.get('Range')
+        ifRange = self.headers.get('If-Range')
+        if rng and (ifRange == None or ifRange in [etag, lastModified]):
+            start = int(rng.split('=')[1].split('-')[0])
+            if start >= len(body):
+                self.send_response(416)
+                self.send_header('Content-Range', 'bytes */' + str(len(body)))
+                self.end_headers()
+                return
+            status = 206
+
+        self.send_response(status)
+        self.send_header('ETag', etag)
+        self.send_header('Last-Modified', lastModified)
+        self.send_header('Content-Length', str(len(body) - start))
+        if status == 206:
+            self.send_header('Content-Range', 'bytes ' + str(start) + '-' + str(len(body) - 1) + '/' + str(len(body)))
+        self.end_headers()
+        self.wfile.write(body[start:])
+
+class site:
+
+    def __init__(self, files = None):
+        self.files = files or {}
+        self.errors = {}
+        self.requests = []
+        self.lastModified = 'Tue, 01 Nov 2022 00:00:00 GMT'
+        self.server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), functools.partial(handler, self))
+        threading.Thread(target = self.server.serve_forever, daemon = True).start()
+        self.url = 'http://127.0.0.1:' + str(self.server.server_address[1])
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
@@ -0,0 +1,192 @@
+import io
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from modules import db_management
+from modules import stig_management
+
+xccdf = """<?xml version="1.0" encoding="utf-8"?>
+<Benchmark xmlns="http://checklists.nist.gov/xccdf/1.1" id="A_STIG">
+<title>A Security Technical Implementation Guide</title>
+</Benchmark>"""
+
+def content_row(zipFolder, date):
+    return {
+        'stigId': 'A_STIG',
+        'fileName': 'U_A_STIG_Manual-xccdf.xml',
+        'zipFolder': zipFolder,
+        'href': 'https://example.com/' + zipFolder,
+        'date': date,
+        'fileType': 'manual',
+        'fileContent': xccdf,
+    }
+
+class stig_db_test(unittest.TestCase):
+
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.tempDir = tempfile.mkdtemp()
+        os.chdir(self.tempDir)
+        os.mkdir('data')
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        shutil.rmtree(self.tempDir)
+
+class manifest_test(stig_db_test):
+
+    def test_archives_sharing_a_stig_id(self):
+        db = db_management.stig()
+        rows = []
+        for zipFolder in ['U_A_STIG.zip', 'U_T0.zip']:
+            rows.append(content_row(zipFolder, '01 Jan 2024'))
+            rows.append(stig_management.synced_row(zipFolder, 'https://example.com/' + zipFolder, '01 Jan 2024'))
+        db.update_content(iter(rows))
+
+        # Only one xccdf_content row survives, both archives are still synced
+        self.assertEqual(db.cur.execute("SELECT COUNT(*) FROM xccdf_content").fetchone()[0], 1)
+        self.assertEqual(db.fetch_manifest(), {'U_A_STIG.zip': {'01 Jan 2024'}, 'U_T0.zip': {'01 Jan 2024'}})
+
+    def test_unfinished_archive_is_not_synced(self):
+        db = db_management.stig()
+        db.update_content(iter([content_row('U_A_STIG.zip', '01 Jan 2024')]))
+        self.assertEqual(db.fetch_manifest(), {})
+
+    def test_manifest_backfilled_from_content(self):
+        db = db_management.stig()
+        db.cur.execute("DROP TABLE xccdf_archive")
+        db.update_content(iter([content_row('U_A_STIG.zip', '01 Jan 2024')]))
+        db.con.close()
+
+        db = db_management.stig()
+        self.assertEqual(db.fetch_manifest(), {'U_A_STIG.zip': {'01 Jan 2024'}})
+
+class blob_test(stig_db_test):
+
+    def blobs(self, db):
+        return db.cur.execute("SELECT COUNT(*) FROM xccdf_blob").fetchone()[0]
+
+    def test_replaced_release_is_pruned(self):
+        db = db_management.stig()
+        for release in range(3):
+            row = content_row('U_A_STIG.zip', '0' + str(release + 1) + ' Jan 2024')
+            row['fileContent'] = xccdf.replace('<title>', '<title>Release ' + str(release) + ' ')
+            db.update_content(iter([row]))
+        self.assertEqual(db.cur.execute("SELECT COUNT(*) FROM xccdf_content").fetchone()[0], 1)
+        self.assertEqual(self.blobs(db), 1)
+        fileHash = db.cur.execute("SELECT fileHash FROM xccdf_content").fetchone()[0]
+        self.assertIn(b'Release 2', db.fetch_blob(fileHash))
+
+    def test_shared_blob_is_kept(self):
+        db = db_management.stig()
+        other = content_row('U_B_STIG.zip', '01 Jan 2024')
+        other['stigId'] = 'B_STIG'
+        db.update_content(iter([content_row('U_A_STIG.zip', '01 Jan 2024'), other]))
+        self.assertEqual(self.blobs(db), 1)
+
+        row = content_row('U_A_STIG.zip', '02 Jan 2024')
+        row['fileContent'] = xccdf.replace('<title>', '<title>Updated ')
+        db.update_content(iter([row]))
+        self.assertEqual(self.blobs(db), 2)
+
+# Index row of a checklist for host with (vuln_num, severity, status) findings
+def ckl_row(file_path, host, findings):
+    return {
+        'file_path': file_path,
+        'size': 1,
+        'mtime': 1.0,
+        'hash': file_path,
+        'hostname': host,
+        'fqdn': None,
+        'ip': None,
+        'stig_id': 'A_STIG',
+        'status': 'final',
+        'not_reviewed': 0,
+        'not_a_finding': 0,
+        'not_applicable': 0,
+        'open': 0,
+        'missing_details': 0,
+        'missing_comments': 0,
+        'asset': {'HOST_NAME': host},
+        'vulns': [(vuln_num, 'SV-' + vuln_num[2:] + 'r1_rule', severity, status, 'CCI-000001') for vuln_num, severity, status in findings],
+    }
+
+class findings_test(stig_db_test):
+
+    def setUp(self):
+        super().setUp()
+        self.db = db_management.asset('Test')
+        self.db.import_ckl([
+            ckl_row('repo/web01.ckl', 'web01', [('V-1', 'high', 'Open'), ('V-2', 'low', 'Open')]),
+            ckl_row('repo/copy/web01.ckl', 'web01', [('V-1', 'high', 'Open'), ('V-2', 'low', 'NotAFinding')]),
+            ckl_row('repo/db01.ckl', 'db01', [('V-1', 'high', 'NotAFinding'), ('V-2', 'low', 'Open')]),
+            ckl_row('repo/app01.ckl', 'app01', [('V-1', 'high', 'Open'), ('V-2', 'low', 'Open')]),
+        ])
+
+    def tearDown(self):
+        self.db.con.close()
+        super().tearDown()
+
+    def test_rule_findings(self):
+        self.assertEqual([(r['host'], r['status']) for r in self.db.rule_findings('A_STIG', 'V-1')], [('app01', 'Open'), ('db01', 'NotAFinding'), ('web01', 'Open'), ('web01', 'Open')])
+        self.assertEqual([r['host'] for r in self.db.rule_findings('A_STIG', 'V-1', 'NotAFinding')], ['db01'])
+
+    def test_rule_hosts(self):
+        self.assertEqual(self.db.rule_hosts('A_STIG', 'V-1'), ['app01', 'web01'])
+        self.assertEqual(self.db.rule_hosts('A_STIG', 'V-2', 'NotAFinding'), ['web01'])
+
+    def test_host_findings(self):
+        self.assertEqual([r['vuln_num'] for r in self.db.host_findings('db01')], ['V-1', 'V-2'])
+        self.assertEqual([r['file_path'] for r in self.db.host_findings('web01', 'NotAFinding')], ['repo/copy/web01.ckl'])
+
+    def test_status_rules_count_hosts(self):
+
+        # web01 has two checklists open on V-1 and is counted once
+        self.assertEqual(self.db.status_rules(), [('A_STIG', 'V-1', 'high', 2), ('A_STIG', 'V-2', 'low', 3)])
+        self.assertEqual(self.db.status_rules('Open', 'low'), [('A_STIG', 'V-2', 'low', 3)])
+
+class migrate_test(stig_db_test):
+
+    # stig.db as written before the blob store, content stored inline
+    def legacy(self, rows):
+        con = sqlite3.connect(os.path.join('data', 'stig.db'))
+        con.execute("CREATE TABLE xccdf_content([stigId] TEXT PRIMARY KEY, [fileName] TEXT, [zipFolder] TEXT, [href] TEXT, [date] TEXT, [fileType] TEXT, [fileContent] BLOB)")
+        for n in range(rows):
+            row = content_row('U_' + str(n) + '_STIG.zip', '01 Jan 2024')
+            row['stigId'] = str(n) + '_STIG'
+            row['fileContent'] = xccdf.replace('A_STIG', str(n) + '_STIG')
+            con.execute("INSERT INTO xccdf_content VALUES(:stigId, :fileName, :zipFolder, :href, :date, :fileType, :fileContent)", row)
+        con.commit()
+        return con
+
+    def check(self, rows):
+        with redirect_stdout(io.StringIO()):
+            db = db_management.stig()
+        tables = [r[0] for r in db.cur.execute("SELECT name FROM sqlite_master").fetchall()]
+        self.assertNotIn('xccdf_content_legacy', tables)
+        self.assertIn('xccdf_content_sync', tables)
+        self.assertEqual(db.cur.execute("SELECT COUNT(*) FROM xccdf_content WHERE fileHash IS NOT NULL").fetchone()[0], rows)
+        fileHash = db.cur.execute("SELECT fileHash FROM xccdf_content WHERE stigId = '3_STIG'").fetchone()[0]
+        self.assertIn(b'id="3_STIG"', db.fetch_blob(fileHash))
+        self.assertEqual(len(db.fetch_manifest()), rows)
+
+    def test_migrate(self):
+        self.legacy(20).close()
+        self.check(20)
+
+    def test_resume_interrupted_migration(self):
+
+        # Interrupted after the rename, with part of the rows copied
+        con = self.legacy(20)
+        con.execute("ALTER TABLE xccdf_content RENAME TO xccdf_content_legacy")
+        con.execute("CREATE TABLE xccdf_content([stigId] TEXT PRIMARY KEY, [fileName] TEXT, [zipFolder] TEXT, [href] TEXT, [date] TEXT, [fileType] TEXT, [fileHash] TEXT)")
+        con.execute("INSERT INTO xccdf_content SELECT stigId, fileName, zipFolder, href, date, fileType, NULL FROM xccdf_content_legacy LIMIT 5")
+        con.commit()
+        con.close()
+        self.check(20)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,95 @@
+import io
+import os
+import json
+import hashlib
+import shutil
+import tempfile
+import unittest
+from zipfile import ZipFile
+from modules import download_management
+from tests import http_fixture
+
+def etag(body):
+    return '"' + hashlib.sha1(body).hexdigest() + '"'
+
+def fixture_zip(name, size):
+    buf = io.BytesIO()
+    with ZipFile(buf, 'w') as z:
+        z.writestr(name + '-xccdf.xml', os.urandom(size))
+    return buf.getvalue()
+
+class downloader_test(unittest.TestCase):
+
+    def setUp(self):
+        self.tempDir = tempfile.mkdtemp()
+        self.site = http_fixture.site({
+            '/U_A_STIG.zip': fixture_zip('U_A_Manual', 300000),
+            '/U_B_STIG.zip': fixture_zip('U_B_Manual', 200000),
+        })
+        self.dl = download_management.downloader(workers = 4, retries = 2, backoff = 0, chunkSize = 64*1024, tempDir = self.tempDir)
+
+    def tearDown(self):
+        self.dl.close()
+        self.site.close()
+        shutil.rmtree(self.tempDir)
+
+    def read(self, fileName):
+        with open(fileName, 'rb') as f:
+            return f.read()
+
+    def test_fetch_all(self):
+        urls = {key: self.site.url + key for key in self.site.files}
+        results = dict(self.dl.fetch_all(urls))
+        self.assertEqual(sorted(results), sorted(urls))
+        for key in results:
+            self.assertEqual(self.read(results[key]), self.site.files[key])
+        self.assertEqual([f for f in os.listdir(self.tempDir) if f.endswith('.part')], [])
+
+    def test_resume_validated_partial(self):
+        url = self.site.url + '/U_A_STIG.zip'
+        body = self.site.files['/U_A_STIG.zip']
+        part = self.dl.temp_path(url) + '.part'
+
+        # Interrupted download of the same archive
+        with open(part, 'wb') as f:
+            f.write(body[:1000])
+        with open(part + '.json', 'w') as f:
+            json.dump({'validator': etag(body), 'length': len(body)}, f)
+
+        self.assertEqual(self.read(self.dl.fetch(url)), body)
+        headers = self.site.requests[-1][1]
+        self.assertEqual(headers['Range'], 'bytes=1000-')
+        self.assertEqual(headers['If-Range'], etag(body))
+        self.assertFalse(os.path.exists(part + '.json'))
+
+    def test_stale_partial_is_replaced(self):
+        url = self.site.url + '/U_A_STIG.zip'
+        part = self.dl.temp_path(url) + '.part'
+
+        # Partial left from last month's archive at the same url
+        with open(part, 'wb') as f:
+            f.write(b'old archive bytes')
+        with open(part + '.json', 'w') as f:
+            json.dump({'validator': '"old-etag"', 'length': 50000}, f)
+
+        self.assertEqual(self.read(self.dl.fetch(url)), self.site.files['/U_A_STIG.zip'])
+
+    def test_partial_without_validator_is_discarded(self):
+        url = self.site.url + '/U_B_STIG.zip'
+        with open(self.dl.temp_path(url) + '.part', 'wb') as f:
+            f.write(b'unknown bytes')
+
+        self.assertEqual(self.read(self.dl.fetch(url)), self.site.files['/U_B_STIG.zip'])
+        self.assertNotIn('Range', self.site.requests[-1][1])
+
+    def test_retry_server_errors(self):
+        self.site.errors['/U_B_STIG.zip'] = [503, 500]
+        fileName = self.dl.fetch(self.site.url + '/U_B_STIG.zip')
+        self.assertEqual(self.read(fileName), self.site.files['/U_B_STIG.zip'])
+
+    def test_missing_archive(self):
+        self.assertIsNone(self.dl.fetch(self.site.url + '/U_C_STIG.zip'))
+        self.assertEqual(self.dl.stats['failed'], 1)
+
+if __name__ == '__main__':
+    unittest.main()
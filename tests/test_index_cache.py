@@ -0,0 +1,64 @@
+import os
+import shutil
+import tempfile
+import unittest
+from modules import download_management
+from modules import stig_management
+from tests import http_fixture
+
+with open(os.path.join(os.path.dirname(__file__), 'data', 'stigs_downloads.html'), 'rb') as f:
+    downloadsPage = f.read()
+
+class index_cache_test(unittest.TestCase):
+
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.tempDir = tempfile.mkdtemp()
+        os.chdir(self.tempDir)
+        os.mkdir('data')
+        os.mkdir('repo')
+        self.site = http_fixture.site({'/stigs/downloads/': downloadsPage})
+        self.repo = stig_management.stig_repo('repo', 'Test')
+        self.repo.url = self.site.url + '/stigs/downloads/'
+
+    def tearDown(self):
+        self.repo.db.con.close()
+        self.repo.assets.con.close()
+        self.site.close()
+        os.chdir(self.cwd)
+        shutil.rmtree(self.tempDir)
+
+    def cached(self):
+        return download_management.index_cache().cache
+
+    def test_recorded_page(self):
+        self.assertTrue(self.repo.check_available())
+        self.assertEqual(sorted(self.repo.content), ['U_A10_Networks_ADC_ALG_V2R1_STIG.zip', 'U_Cisco_IOS_XE_Router_CAC_Only.zip', 'U_STIG_Library_User_Guide.pdf', 'U_T0.zip'])
+        self.assertEqual(self.repo.content['U_T0.zip']['date'], '24 Oct 2023')
+        self.assertEqual(self.repo.content['U_T0.zip']['href'], 'https://dl.dod.cyber.mil/wp-content/uploads/stigs/zip/U_T0.zip')
+        self.assertEqual(self.repo.content['U_Cisco_IOS_XE_Router_CAC_Only.zip']['href'], None)
+        self.assertEqual(self.cached()[self.repo.url]['content'], self.repo.content)
+
+    def test_unchanged_page_is_revalidated(self):
+        self.assertTrue(self.repo.check_available())
+        first = self.repo.content
+        self.repo.content = None
+        self.assertTrue(self.repo.check_available())
+        self.assertEqual(self.repo.content, first)
+        self.assertIn('If-None-Match', self.site.requests[-1][1])
+
+    def test_error_page_is_not_cached(self):
+        for status in [403, 500, 503]:
+            with self.subTest(status = status):
+                self.site.errors['/stigs/downloads/'] = [status]
+                self.assertFalse(self.repo.check_available())
+                self.assertNotIn(self.repo.url, self.cached())
+
+    def test_error_keeps_previous_page(self):
+        self.assertTrue(self.repo.check_available())
+        self.site.errors['/stigs/downloads/'] = [403]
+        self.assertFalse(self.repo.check_available())
+        self.assertEqual(len(self.cached()[self.repo.url]['content']), 4)
+
+if __name__ == '__main__':
+    unittest.main()
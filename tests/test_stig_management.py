@@ -0,0 +1,265 @@
+import io
+import os
+import shutil
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from zipfile import ZipFile
+from modules import stig_management
+
+xccdf = b"""<?xml version="1.0" encoding="utf-8"?>
+<Benchmark xmlns="http://checklists.nist.gov/xccdf/1.1" id="A_STIG">
+<title>A Security Technical Implementation Guide</title>
+<Group id="V-1"><title>SRG</title><Rule id="SV-1r1_rule"><title>Rule one</title></Rule></Group>
+</Benchmark>"""
+
+def zip_bytes(members):
+    buf = io.BytesIO()
+    with ZipFile(buf, 'w') as z:
+        for name in members:
+            z.writestr(name, members[name])
+    return buf.getvalue()
+
+class scan_zip_test(unittest.TestCase):
+
+    def setUp(self):
+        self.tempDir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tempDir)
+
+    def write(self, name, data):
+        fileName = os.path.join(self.tempDir, name)
+        with open(fileName, 'wb') as f:
+            f.write(data)
+        return fileName
+
+    def test_xccdf_members(self):
+        members = stig_management.scan_zip(self.write('a.zip', zip_bytes({'U_A_STIG_Manual-xccdf.xml': xccdf})))
+        self.assertEqual([(m['stigId'], m['fileType']) for m in members], [('A_STIG', 'manual')])
+
+    def test_zip_without_xccdf(self):
+        self.assertEqual(stig_management.scan_zip(self.write('b.zip', zip_bytes({'readme.txt': b'text'}))), [])
+
+    def test_unreadable_archives(self):
+        archive = zip_bytes({'U_A_STIG_Manual-xccdf.xml': xccdf})
+        self.assertIsNone(stig_management.scan_zip(self.write('c.zip', archive[:len(archive)//2])))
+        self.assertIsNone(stig_management.scan_zip(self.write('d.zip', b'<html>Access Denied</html>')))
+
+ckl = """<?xml version="1.0" encoding="UTF-8"?>
+<CHECKLIST>
+<ASSET><HOST_NAME>%s</HOST_NAME></ASSET>
+<STIGS><iSTIG>
+<STIG_INFO>
+<SI_DATA><SID_NAME>stigid</SID_NAME><SID_DATA>A_STIG</SID_DATA></SI_DATA>
+<SI_DATA><SID_NAME>releaseinfo</SID_NAME><SID_DATA>Release: 1 Benchmark Date: 01 Jan 2024</SID_DATA></SI_DATA>
+</STIG_INFO>
+<VULN>
+<STIG_DATA><VULN_ATTRIBUTE>Vuln_Num</VULN_ATTRIBUTE><ATTRIBUTE_DATA>V-1</ATTRIBUTE_DATA></STIG_DATA>
+<STIG_DATA><VULN_ATTRIBUTE>Severity</VULN_ATTRIBUTE><ATTRIBUTE_DATA>high</ATTRIBUTE_DATA></STIG_DATA>
+<STIG_DATA><VULN_ATTRIBUTE>CCI_REF</VULN_ATTRIBUTE><ATTRIBUTE_DATA>CCI-000001</ATTRIBUTE_DATA></STIG_DATA>
+<STATUS>Open</STATUS>
+</VULN>
+</iSTIG></STIGS>
+</CHECKLIST>"""
+
+class unique_hosts_test(unittest.TestCase):
+
+    def test_colliding_rows_are_rejected(self):
+        tempDir = tempfile.mkdtemp()
+        try:
+            inventory = os.path.join(tempDir, 'inventory.csv')
+            with open(inventory, 'w') as f:
+                f.write("Host Name,IP Address\nweb01,10.0.0.1\n,10.0.0.2\ndb01,10.0.0.3\nWEB01,10.0.0.4\n,10.0.0.5\nTemplate,10.0.0.6\napp01,10.0.0.7\n")
+            hosts, rejected = stig_management.unique_hosts(stig_management.read_inventory(inventory))
+        finally:
+            shutil.rmtree(tempDir)
+
+        self.assertEqual([h['HOST_NAME'] for h in hosts], ['db01', 'app01'])
+        self.assertEqual([n for n, h in rejected], [2, 3, 5, 6, 7])
+
+    def test_single_template_row(self):
+        hosts = [stig_management.default_host_data()]
+        self.assertEqual(stig_management.unique_hosts(hosts), (hosts, []))
+
+class repo_test(unittest.TestCase):
+
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.tempDir = tempfile.mkdtemp()
+        os.chdir(self.tempDir)
+        os.mkdir('data')
+        os.mkdir('repo')
+        self.repo = stig_management.stig_repo('repo', 'Test')
+
+    def tearDown(self):
+        self.repo.db.con.close()
+        self.repo.assets.con.close()
+        os.chdir(self.cwd)
+        shutil.rmtree(self.tempDir)
+
+    def write(self, name, text):
+        with open(os.path.join('repo', name), 'w') as f:
+            f.write(text)
+
+class update_index_test(repo_test):
+
+    def indexed(self):
+        return sorted([row['hostname'] for row in self.repo.assets.fetch_ckls()])
+
+    def test_malformed_checklist_is_skipped(self):
+        for workers in [1, 2]:
+            with self.subTest(workers = workers):
+                for i in range(3):
+                    self.write('host' + str(i) + '.ckl', ckl % ('host' + str(i)))
+                self.write('broken.ckl', (ckl % 'broken')[:200])
+                self.write('status.ckl', (ckl % 'status').replace('Open', 'Unknown'))
+                self.assertEqual(self.repo.update_index(workers), 3)
+                self.assertEqual(self.indexed(), ['host0', 'host1', 'host2'])
+                for name in os.listdir('repo'):
+                    if name.endswith('.ckl'):
+                        os.remove(os.path.join('repo', name))
+                self.repo.update_index(workers)
+
+    def test_checklist_broken_after_indexing(self):
+        self.write('host0.ckl', ckl % 'host0')
+        self.repo.update_index(1)
+        self.assertEqual(self.indexed(), ['host0'])
+        self.write('host0.ckl', (ckl % 'host0')[:200] + ' ' * 50)
+        self.assertEqual(self.repo.update_index(1), 0)
+        self.assertEqual(self.indexed(), [])
+
+class diff_test(repo_test):
+
+    def setUp(self):
+        super().setUp()
+        for side in ['old', 'new']:
+            os.mkdir(os.path.join('repo', side))
+
+    def test_duplicate_keys_are_reported(self):
+        for side in ['old', 'new']:
+            self.write(os.path.join(side, 'host0.ckl'), ckl % 'host0')
+            self.write(os.path.join(side, 'template1.ckl'), ckl % '')
+            self.write(os.path.join(side, 'template2.ckl'), ckl % '')
+        self.write(os.path.join('new', 'host0.ckl'), (ckl % 'host0').replace('Open', 'NotAFinding'))
+        tables = self.repo.diff(os.path.join('repo', 'old'), os.path.join('repo', 'new'), 1, ('json',))
+
+        self.assertEqual([row[5:] for row in tables['Changes'][1]], [('transition', 'Open', 'NotAFinding')])
+        checklists = tables['Checklists'][1]
+        self.assertEqual([row[2] for row in checklists], ['duplicate'] * 4)
+        self.assertEqual(sorted([os.path.basename(row[3] or row[4]) for row in checklists]), ['template1.ckl', 'template1.ckl', 'template2.ckl', 'template2.ckl'])
+
+    def test_file_against_directory(self):
+        self.write(os.path.join('old', 'host0.ckl'), ckl % 'host0')
+        with self.assertRaises(ValueError):
+            self.repo.diff(os.path.join('repo', 'old', 'host0.ckl'), os.path.join('repo', 'new'), 1, ('json',))
+
+class report_test(repo_test):
+
+    def test_only_sorted_checklists_are_summarized(self):
+        for s, host in [('wip', 'web01'), ('final', 'db01'), ('archive', 'old01')]:
+            self.write(os.path.relpath(os.path.join(self.repo.fileStructure[s]['path'], host + '.ckl'), 'repo'), ckl % host)
+        self.write('unsorted.ckl', ckl % 'new01')
+        with redirect_stdout(io.StringIO()):
+            tables = self.repo.report(formats = ('json',))
+
+        self.assertEqual([row[0] for row in tables['Hosts'][1]], ['db01', 'web01'])
+        self.assertEqual(tables['STIGs'][1], [('A_STIG', 2, 0, 2, 0, 0, 0, 0)])
+        self.assertEqual(tables['Severity'][1], [('high', 0, 2, 0, 0)])
+
+class rollup_test(repo_test):
+
+    def test_sorted_and_imported_checklists_roll_up(self):
+        for s, host in [('wip', 'web01'), ('final', 'db01'), ('archive', 'old01')]:
+            self.write(os.path.relpath(os.path.join(self.repo.fileStructure[s]['path'], host + '.ckl'), 'repo'), ckl % host)
+        self.write('unsorted.ckl', ckl % 'new01')
+        os.mkdir('imported')
+        with open(os.path.join('imported', 'app01.ckl'), 'w') as f:
+            f.write(ckl % 'app01')
+        self.repo.db.cur.execute("INSERT INTO cci_control VALUES('CCI-000001', '4', 'AC-1', 'NIST SP 800-53 Revision 4 (v4)')")
+        self.repo.db.con.commit()
+        with redirect_stdout(io.StringIO()):
+            self.repo.import_ckls('imported', 1)
+            tables = self.repo.rollup(formats = ('json',))
+
+        self.assertEqual(tables['Controls'][1], [('AC-1', 3, 3, 3, 0, 0, 0, 'Non-Compliant')])
+
+def release_xccdf(release):
+    return ("""<?xml version="1.0" encoding="utf-8"?>
+<Benchmark xmlns:dc="http://purl.org/dc/elements/1.1/" xmlns="http://checklists.nist.gov/xccdf/1.1" id="T_STIG" xml:lang="en">
+<status date="2024-01-01">accepted</status><title>T Security Technical Implementation Guide</title><description>T</description>
+<reference href="https://cyber.mil"><dc:publisher>DISA</dc:publisher><dc:source>STIG.DOD.MIL</dc:source></reference>
+<plain-text id="release-info">Release: %d Benchmark Date: 01 Jan 2024</plain-text><version>2</version>
+<Group id="V-1"><title>SRG-1</title><description>&lt;GroupDescription&gt;&lt;/GroupDescription&gt;</description>
+<Rule id="SV-1r%d_rule" weight="10.0" severity="high"><version>T-1</version><title>Rule one</title>
+<description>&lt;VulnDiscussion&gt;Discussion&lt;/VulnDiscussion&gt;</description>
+<ident system="http://cyber.mil/cci">CCI-000001</ident><fixtext fixref="F-1_fix">Fix</fixtext><fix id="F-1_fix" />
+<check system="C-1_chk"><check-content-ref href="T_Manual-xccdf.xml" name="M" /><check-content>Check</check-content></check></Rule></Group>
+</Benchmark>""" % (release, release)).encode('utf-8')
+
+class upgrade_test(repo_test):
+
+    def setUp(self):
+        super().setUp()
+        self.repo.db.update_content(iter([{
+            'stigId': 'T_STIG',
+            'fileName': 'U_T_STIG_Manual-xccdf.xml',
+            'zipFolder': 'U_T_STIG.zip',
+            'href': 'https://example.com/U_T_STIG.zip',
+            'date': '01 Jan 2024',
+            'fileType': 'manual',
+            'fileContent': release_xccdf(7),
+        }]))
+        self.wip = self.repo.fileStructure['wip']['path']
+
+    # Checklist of a release for web01 with every rule set to status, returning its path
+    def checklist(self, release, status):
+        xccdf_dict = stig_management.parse_xccdf('U_T_STIG_Manual-xccdf.xml', release_xccdf(release))
+        host_data = stig_management.default_host_data()
+        host_data['HOST_NAME'] = 'web01'
+        fPath = os.path.join(self.wip, stig_management.name_xccdf_ckl(xccdf_dict, host_data))
+        with open(fPath, 'w', encoding = 'UTF-8', newline = '') as f:
+            f.write(stig_management.generate_ckl(xccdf_dict, host_data).replace('<STATUS>Not_Reviewed</STATUS>', '<STATUS>' + status + '</STATUS>'))
+        return fPath
+
+    def statuses(self, fPath):
+        return [v[3] for v in stig_management.scan_ckl(fPath, vulns = True)['VULN']]
+
+    def upgrade(self):
+        with redirect_stdout(io.StringIO()):
+            return self.repo.upgrade(1)
+
+    def test_upgrade(self):
+        old = self.checklist(5, 'Open')
+        upgraded = self.upgrade()
+        self.assertEqual(len(upgraded), 1)
+        self.assertFalse(os.path.exists(old))
+        self.assertEqual(self.statuses(upgraded[0][1]), ['Open'])
+        self.assertTrue(upgraded[0][1].endswith('_v2r7_01-Jan-2024.ckl'))
+        self.assertFalse(os.path.exists(os.path.join('data', 'move_journal.jsonl')))
+
+    def test_sort_keeps_archived_checklists(self):
+        old = self.checklist(5, 'Open')
+        self.upgrade()
+        archived = os.path.join(self.repo.fileStructure['archive']['path'], os.path.basename(old))
+        self.assertTrue(os.path.exists(archived))
+        with redirect_stdout(io.StringIO()):
+            self.repo.sort(1)
+        self.assertTrue(os.path.exists(archived))
+        self.assertEqual(len(os.listdir(self.repo.fileStructure['final']['path'])), 1)
+
+    def test_existing_upgrade_is_kept(self):
+        old = self.checklist(5, 'Open')
+        reviewed = self.checklist(7, 'NotAFinding')
+        self.assertEqual(self.upgrade(), [])
+        self.assertEqual(self.statuses(reviewed), ['NotAFinding'])
+        self.assertTrue(os.path.exists(old))
+
+    def test_releases_sharing_an_upgrade(self):
+        older = self.checklist(5, 'Open')
+        newer = self.checklist(6, 'NotAFinding')
+        self.assertEqual(self.upgrade(), [])
+        self.assertEqual(sorted(os.listdir(self.wip)), sorted([os.path.basename(older), os.path.basename(newer)]))
+
+if __name__ == '__main__':
+    unittest.main()
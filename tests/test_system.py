@@ -0,0 +1,100 @@
+import io
+import os
+import shutil
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from unittest import mock
+from modules import system
+
+class update_env_test(unittest.TestCase):
+
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.tempDir = tempfile.mkdtemp()
+        os.chdir(self.tempDir)
+        os.mkdir('data')
+        self.env = system.environment()
+        self.env.env['Sort Conflict Policy'] = 'skip'
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        shutil.rmtree(self.tempDir)
+
+    def update(self, answers):
+        with mock.patch('builtins.input', side_effect = answers), redirect_stdout(io.StringIO()):
+            self.env.update_env('Sort Conflict Policy')
+        return self.env.read_env()['Sort Conflict Policy']
+
+    def test_policy_typo_is_rejected(self):
+        self.assertEqual(self.update(['newst', 'newest']), 'newest')
+
+    def test_policy_default(self):
+        self.assertEqual(self.update(['']), 'skip')
+
+class move_plan_test(unittest.TestCase):
+
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.tempDir = tempfile.mkdtemp()
+        os.chdir(self.tempDir)
+        for folder in ['data', 'incoming', 'wip', 'final']:
+            os.mkdir(folder)
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        shutil.rmtree(self.tempDir)
+
+    def write(self, path, text, mtime):
+        with open(path, 'w') as f:
+            f.write(text)
+        os.utime(path, (mtime, mtime))
+
+    def read(self, path):
+        with open(path) as f:
+            return f.read()
+
+    def apply(self, plan):
+        with redirect_stdout(io.StringIO()):
+            plan.resolve()
+            return plan.apply()
+
+    def test_destination_moving_away(self):
+        self.write(os.path.join('incoming', 'X.ckl'), 'unreviewed', 2000)
+        self.write(os.path.join('wip', 'X.ckl'), 'reviewed', 1000)
+        plan = system.move_plan('newest')
+        plan.add(os.path.join('incoming', 'X.ckl'), os.path.join('wip', 'X.ckl'))
+        plan.add(os.path.join('wip', 'X.ckl'), os.path.join('final', 'X.ckl'))
+        self.apply(plan)
+
+        self.assertEqual([a[0] for a in plan.actions], ['move', 'move'])
+        self.assertEqual(self.read(os.path.join('wip', 'X.ckl')), 'unreviewed')
+        self.assertEqual(self.read(os.path.join('final', 'X.ckl')), 'reviewed')
+
+    def test_backups_are_unique_per_run(self):
+        for n in range(2):
+            self.write(os.path.join('wip', 'X.ckl'), 'old ' + str(n), 1000)
+            self.write(os.path.join('incoming', 'X.ckl'), 'new ' + str(n), 2000)
+            plan = system.move_plan('newest')
+            plan.add(os.path.join('incoming', 'X.ckl'), os.path.join('wip', 'X.ckl'))
+            self.apply(plan)
+            self.assertEqual([a[0] for a in plan.actions], ['replace'])
+            os.remove(os.path.join('wip', 'X.ckl'))
+
+        backups = []
+        for root, folders, files in os.walk(os.path.join('data', 'move_backup')):
+            backups = backups + [self.read(os.path.join(root, f)) for f in files]
+        self.assertEqual(sorted(backups), ['old 0', 'old 1'])
+
+    def test_move_never_overwrites(self):
+        self.write(os.path.join('incoming', 'X.ckl'), 'new', 2000)
+        plan = system.move_plan('skip')
+        plan.add(os.path.join('incoming', 'X.ckl'), os.path.join('wip', 'X.ckl'))
+        with redirect_stdout(io.StringIO()):
+            plan.resolve()
+            self.write(os.path.join('wip', 'X.ckl'), 'arrived since resolve', 1000)
+            self.assertEqual(plan.apply(), [])
+        self.assertEqual(self.read(os.path.join('wip', 'X.ckl')), 'arrived since resolve')
+
+if __name__ == '__main__':
+    unittest.main()